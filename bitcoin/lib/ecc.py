@@ -0,0 +1 @@
+../../monero/ecc.py
\ No newline at end of file
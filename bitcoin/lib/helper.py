@@ -1,273 +0,0 @@
-import hashlib
-
-
-SIGHASH_ALL = 1
-SIGHASH_NONE = 2
-SIGHASH_SINGLE = 3
-BASE58_ALPHABET = '123456789ABCDEFGHJKLMNPQRSTUVWXYZabcdefghijkmnopqrstuvwxyz'
-TWO_WEEKS = 60 * 60 * 24 * 14
-MAX_TARGET = 0xffff * 256**(0x1d - 3)
-
-
-def hash160(s):
-    '''sha256 followed by ripemd160'''
-    return hashlib.new('ripemd160', hashlib.sha256(s).digest()).digest()
-
-
-def hash256(s):
-    '''two rounds of sha256'''
-    return hashlib.sha256(hashlib.sha256(s).digest()).digest()
-
-
-def encode_base58(s):
-    # determine how many 0 bytes (b'\x00') s starts with
-    count = 0
-    for c in s:
-        if c == 0:
-            count += 1
-        else:
-            break
-    # convert to big endian integer
-    num = int.from_bytes(s, 'big')
-    prefix = '1' * count
-    result = ''
-    while num > 0:
-        num, mod = divmod(num, 58)
-        result = BASE58_ALPHABET[mod] + result
-    return prefix + result
-
-
-def encode_base58_checksum(s):
-    return encode_base58(s + hash256(s)[:4])
-
-
-def decode_base58(s):
-    num = 0
-    for c in s:
-        num *= 58
-        num += BASE58_ALPHABET.index(c)
-    combined = num.to_bytes(25, byteorder='big')
-    checksum = combined[-4:]
-    if hash256(combined[:-4])[:4] != checksum:
-        raise ValueError('bad address: {} {}'.format(checksum, hash256(combined[:-4])[:4]))
-    return combined[1:-4]
-
-
-def little_endian_to_int(b):
-    '''little_endian_to_int takes byte sequence as a little-endian number.
-    Returns an integer'''
-    return int.from_bytes(b, 'little')
-
-
-def int_to_little_endian(n, length):
-    '''endian_to_little_endian takes an integer and returns the little-endian
-    byte sequence of length'''
-    return n.to_bytes(length, 'little')
-
-
-def read_varint(s):
-    '''read_varint reads a variable integer from a stream'''
-    i = s.read(1)[0]
-    if i == 0xfd:
-        # 0xfd means the next two bytes are the number
-        return little_endian_to_int(s.read(2))
-    elif i == 0xfe:
-        # 0xfe means the next four bytes are the number
-        return little_endian_to_int(s.read(4))
-    elif i == 0xff:
-        # 0xff means the next eight bytes are the number
-        return little_endian_to_int(s.read(8))
-    else:
-        # anything else is just the integer
-        return i
-
-
-def encode_varint(i):
-    '''encodes an integer as a varint'''
-    if i < 0xfd:
-        return bytes([i])
-    elif i < 0x10000:
-        return b'\xfd' + int_to_little_endian(i, 2)
-    elif i < 0x100000000:
-        return b'\xfe' + int_to_little_endian(i, 4)
-    elif i < 0x10000000000000000:
-        return b'\xff' + int_to_little_endian(i, 8)
-    else:
-        raise ValueError('integer too large: {}'.format(i))
-
-
-def h160_to_p2pkh_address(h160, testnet=False):
-    '''Takes a byte sequence hash160 and returns a p2pkh address string'''
-    # p2pkh has a prefix of b'\x00' for mainnet, b'\x6f' for testnet
-    if testnet:
-        prefix = b'\x6f'
-    else:
-        prefix = b'\x00'
-    return encode_base58_checksum(prefix + h160)
-
-
-def h160_to_p2sh_address(h160, testnet=False):
-    '''Takes a byte sequence hash160 and returns a p2sh address string'''
-    # p2sh has a prefix of b'\x05' for mainnet, b'\xc4' for testnet
-    if testnet:
-        prefix = b'\xc4'
-    else:
-        prefix = b'\x05'
-    return encode_base58_checksum(prefix + h160)
-
-
-def bits_to_target(bits):
-    '''Turns bits into a target (large 256-bit integer)'''
-    # last byte is exponent
-    exponent = bits[-1]
-    # the first three bytes are the coefficient in little endian
-    coefficient = little_endian_to_int(bits[:-1])
-    # the formula is:
-    # coefficient * 256**(exponent-3)
-    return coefficient * 256**(exponent - 3)
-
-
-def target_to_bits(target):
-    '''Turns a target integer back into bits, which is 4 bytes'''
-    raw_bytes = target.to_bytes(32, 'big')
-    # get rid of leading 0's
-    raw_bytes = raw_bytes.lstrip(b'\x00')
-    if raw_bytes[0] > 0x7f:
-        # if the first bit is 1, we have to start with 00
-        exponent = len(raw_bytes) + 1
-        coefficient = b'\x00' + raw_bytes[:2]
-    else:
-        # otherwise, we can show the first 3 bytes
-        # exponent is the number of digits in base-256
-        exponent = len(raw_bytes)
-        # coefficient is the first 3 digits of the base-256 number
-        coefficient = raw_bytes[:3]
-    # we've truncated the number after the first 3 digits of base-256
-    new_bits = coefficient[::-1] + bytes([exponent])
-    return new_bits
-
-
-def calculate_new_bits(previous_bits, time_differential):
-    '''Calculates the new bits given
-    a 2016-block time differential and the previous bits'''
-    # if the time differential is greater than 8 weeks, set to 8 weeks
-    if time_differential > TWO_WEEKS * 4:
-        time_differential = TWO_WEEKS * 4
-    # if the time differential is less than half a week, set to half a week
-    if time_differential < TWO_WEEKS // 4:
-        time_differential = TWO_WEEKS // 4
-    # the new target is the previous target * time differential / two weeks
-    new_target = bits_to_target(previous_bits) * time_differential // TWO_WEEKS
-    # if the new target is bigger than MAX_TARGET, set to MAX_TARGET
-    if new_target > MAX_TARGET:
-        new_target = MAX_TARGET
-    # convert the new target to bits
-    return target_to_bits(new_target)
-
-
-def merkle_parent(hash1, hash2):
-    '''Takes the binary hashes and calculates the hash256'''
-    # return the hash256 of hash1 + hash2
-    return hash256(hash1 + hash2)
-
-
-def merkle_parent_level(hashes):
-    '''Takes a list of binary hashes and returns a list that's half
-    the length'''
-    # if the list has exactly 1 element raise an error
-    if len(hashes) == 1:
-        raise RuntimeError('Cannot take a parent level with only 1 item')
-    # if the list has an odd number of elements, duplicate the last one
-    # and put it at the end so it has an even number of elements
-    if len(hashes) % 2 == 1:
-        hashes.append(hashes[-1])
-    # initialize next level
-    parent_level = []
-    # loop over every pair (use: for i in range(0, len(hashes), 2))
-    for i in range(0, len(hashes), 2):
-        # get the merkle parent of the hashes at index i and i+1
-        parent = merkle_parent(hashes[i], hashes[i + 1])
-        # append parent to parent level
-        parent_level.append(parent)
-    # return parent level
-    return parent_level
-
-
-def merkle_root(hashes):
-    '''Takes a list of binary hashes and returns the merkle root
-    '''
-    # current level starts as hashes
-    current_level = hashes
-    # loop until there's exactly 1 element
-    while len(current_level) > 1:
-        # current level becomes the merkle parent level
-        current_level = merkle_parent_level(current_level)
-    # return the 1st item of the current level
-    return current_level[0]
-
-
-def bit_field_to_bytes(bit_field):
-    if len(bit_field) % 8 != 0:
-        raise RuntimeError('bit_field does not have a length that is divisible by 8')
-    result = bytearray(len(bit_field) // 8)
-    for i, bit in enumerate(bit_field):
-        byte_index, bit_index = divmod(i, 8)
-        if bit:
-            result[byte_index] |= 1 << bit_index
-    return bytes(result)
-
-
-def bytes_to_bit_field(some_bytes):
-    flag_bits = []
-    # iterate over each byte of flags
-    for byte in some_bytes:
-        # iterate over each bit, right-to-left
-        for _ in range(8):
-            # add the current bit (byte & 1)
-            flag_bits.append(byte & 1)
-            # rightshift the byte 1
-            byte >>= 1
-    return flag_bits
-
-
-def murmur3(data, seed=0):
-    '''from http://stackoverflow.com/questions/13305290/is-there-a-pure-python-implementation-of-murmurhash'''
-    c1 = 0xcc9e2d51
-    c2 = 0x1b873593
-    length = len(data)
-    h1 = seed
-    roundedEnd = (length & 0xfffffffc)  # round down to 4 byte block
-    for i in range(0, roundedEnd, 4):
-        # little endian load order
-        k1 = (data[i] & 0xff) | ((data[i + 1] & 0xff) << 8) | \
-            ((data[i + 2] & 0xff) << 16) | (data[i + 3] << 24)
-        k1 *= c1
-        k1 = (k1 << 15) | ((k1 & 0xffffffff) >> 17)  # ROTL32(k1,15)
-        k1 *= c2
-        h1 ^= k1
-        h1 = (h1 << 13) | ((h1 & 0xffffffff) >> 19)  # ROTL32(h1,13)
-        h1 = h1 * 5 + 0xe6546b64
-    # tail
-    k1 = 0
-    val = length & 0x03
-    if val == 3:
-        k1 = (data[roundedEnd + 2] & 0xff) << 16
-    # fallthrough
-    if val in [2, 3]:
-        k1 |= (data[roundedEnd + 1] & 0xff) << 8
-    # fallthrough
-    if val in [1, 2, 3]:
-        k1 |= data[roundedEnd] & 0xff
-        k1 *= c1
-        k1 = (k1 << 15) | ((k1 & 0xffffffff) >> 17)  # ROTL32(k1,15)
-        k1 *= c2
-        h1 ^= k1
-    # finalization
-    h1 ^= length
-    # fmix(h1)
-    h1 ^= ((h1 & 0xffffffff) >> 16)
-    h1 *= 0x85ebca6b
-    h1 ^= ((h1 & 0xffffffff) >> 13)
-    h1 *= 0xc2b2ae35
-    h1 ^= ((h1 & 0xffffffff) >> 16)
-    return h1 & 0xffffffff
\ No newline at end of file
@@ -0,0 +1 @@
+../../monero/helper.py
\ No newline at end of file
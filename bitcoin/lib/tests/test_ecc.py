@@ -223,6 +223,29 @@ class S256Test(TestCase):
         s = 0xc7207fee197d27c618aea621406f6bf5ef6fca38681d82b2f06fddbdce6feab6
         self.assertTrue(point.verify(z, Signature(r, s)))
 
+    def test_jacobian(self):
+        for _ in range(5):
+            a, b = randint(1, N - 1), randint(1, N - 1)
+            p, q = a * G, b * G
+            total = p + q
+            # arithmetic results convert back to valid affine points
+            self.assertEqual(S256Point(total.x.num, total.y.num), total)
+            self.assertEqual(total, (a + b) * G)
+            self.assertEqual(p - q, (a - b) * G)
+            self.assertEqual(p + p, 2 * p)
+            self.assertIsNone((p - p).x)
+            self.assertNotEqual(p, q)
+
+    def test_multi_mul(self):
+        points = [randint(1, N - 1) * G for _ in range(4)] + [G]
+        scalars = [randint(0, N - 1) for _ in range(4)] + [-randint(0, N - 1)]
+        expected = S256Point(None, None)
+        for scalar, point in zip(scalars, points):
+            expected += scalar * point
+        self.assertEqual(multi_mul(list(zip(scalars, points))), expected)
+        self.assertIsNone(multi_mul([]).x)
+        self.assertIsNone(multi_mul([(5, G), (-5, G)]).x)
+
     def test_sec(self):
         coefficient = 999**3
         uncompressed = '049d5ca49670cbe4c3bfa84c96a8c87df086c6ea6a24ba6b809c9de234496808d56fa15cc7f3d38cda98dee2419f415b7513dde1301f8643cd9245aea7f3f911f9'
@@ -242,6 +265,16 @@ class S256Test(TestCase):
         point = coefficient * G
         self.assertEqual(point.sec(compressed=False), bytes.fromhex(uncompressed))
         self.assertEqual(point.sec(compressed=True), bytes.fromhex(compressed))
+        # each point has a single compressed encoding
+        x = bytes.fromhex(compressed)[1:]
+        for prefix in (b'\x00', b'\x01', b'\x05', b'\x07', b'\xff'):
+            with self.assertRaises(ValueError):
+                S256Point.parse(prefix + x)
+        with self.assertRaises(ValueError):
+            S256Point.parse(bytes.fromhex(compressed)[:-1])
+        with self.assertRaises(ValueError):
+            S256Point.parse(bytes.fromhex(uncompressed)[:33])
+        self.assertEqual(S256Point.parse(bytes.fromhex(compressed)).sec(), bytes.fromhex(compressed))
 
     def test_address(self):
         secret = 888**3
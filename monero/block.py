@@ -109,16 +109,32 @@ class Block:
         return images
 
     
-    def verify(self):
+    def ringJobs(self):
+        jobs = []
+        for tx in self.txs:
+            jobs += tx.ringJobs()
+        return jobs
+    
+    def verify(self, verifier=None, rings=True, ringVersion=None):
+        # verifier: a verifier.Verifier, checks the inputs of every tx
+        #   in one parallel batch
+        # rings: False skips the ring signatures, see Tx.verify
+        # ringVersion: the H_p version every tx must use, see Chain
         if not self.prev_block.startswith(TARGET):
             return False
         if not self.hash().startswith(TARGET):
             return False
         if not self.miner.verify():
             return False
+        if rings and verifier is not None:
+            if not all(verifier.verify(self.ringJobs())):
+                return False
+            rings = False
         minerAmount = self.miner.tx_outs[0].amount
         for tx in self.txs:
-            if not tx.verify():
+            if ringVersion is not None and tx.ringVersion() not in (None, ringVersion):
+                return False
+            if not tx.verify(rings=rings):
                 return False
             minerAmount -= tx.fee
         if minerAmount != MINER_REWARD:
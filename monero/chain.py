@@ -5,7 +5,8 @@ import inspect
 from io import BytesIO
 from address import UserKeys
 from block import Block
-from tx import Tx
+from tx import Tx, currentRingVersion
+from store import BlockStore, MappedBlocks
 from helper import (
     read_varint,
     encode_varint,
@@ -13,13 +14,26 @@ from helper import (
 
 
 currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
+# chains are kept in a directory per name under DATA_PATH, set by the
+# RING_DATA environment variable
+DATA_PATH = os.environ.get('RING_DATA') or os.path.join(currentdir, 'data')
 
 class Chain:
 
-    def __init__(self, name, blocks=[], txs=[]):
+    def __init__(self, name, blocks=[], txs=[], ringVersion=None):
         self.name = name
         self.blocks = blocks
         self.txs = txs
+        # H_p version of every key image on the chain, the one of TX_TYPE
+        # by default. An output has one key image per version, so mixing
+        # versions would let it be spent once in each
+        if ringVersion is None:
+            ringVersion = currentRingVersion()
+        self.ringVersion = ringVersion
+        # number of blocks in the block log known to be self.blocks,
+        # None until the log is loaded or written
+        self.stored = None
+        self.reindex()
     
 
     def __eq__(self, other):
@@ -105,49 +119,143 @@ class Chain:
         
         return txs
 
+    def getDataDir(self):
+        return os.path.join(DATA_PATH, self.name)
+
     def getBlockDataFile(self):
-        return os.path.join(currentdir, 'data', self.name, 'chain.dat')
+        return os.path.join(self.getDataDir(), 'chain.dat')
     
     def getTxDataFile(self):
-        return os.path.join(currentdir, 'data', self.name, 'tx.dat')
+        return os.path.join(self.getDataDir(), 'tx.dat')
     
 
+    def getBlockStore(self):
+        return BlockStore(self.getBlockDataFile())
+
     def dumpBlockData(self):
-        with open(self.getBlockDataFile(), 'wb+') as f:
-            f.write(self.serializeBlocks())
+        # rewrites the whole block log, see appendBlockData
+        self.unmapBlocks()
+        self.getBlockStore().rewrite(block.serialize() for block in self.blocks)
+        self.stored = len(self.blocks)
+
+    def appendBlockData(self, height):
+        # stores the blocks from height on, after dropping the stored
+        # blocks they replace; the blocks below height are not rewritten
+        if self.stored is None:
+            return self.dumpBlockData()
+        height = min(height, self.stored)
+        store = self.getBlockStore()
+        store.truncate(height)
+        for block in self.blocks[height:]:
+            store.append(block.serialize())
+        self.stored = len(self.blocks)
 
     def dumpTxData(self):
         with open(self.getTxDataFile(), 'wb+') as f:
             f.write(self.serializeTxs())
 
-    def loadBlockData(self):
-        with open(self.getBlockDataFile(), 'rb') as f:
-            self.blocks = self.parseBlocks(BytesIO(f.read()))
+    def loadBlockData(self, mapped=False):
+        # mapped: parse blocks when they are first used, see MappedBlocks
+        self.unmapBlocks(keep=False)
+        store = self.getBlockStore()
+        if not store.isLog():
+            # chain.dat written by serializeBlocks, move it to the log
+            with open(self.getBlockDataFile(), 'rb') as f:
+                self.blocks = self.parseBlocks(BytesIO(f.read()))
+            self.dumpBlockData()
+        elif mapped:
+            self.blocks = MappedBlocks(store, lambda s: Block.parse(BytesIO(s)))
+        else:
+            self.blocks = [Block.parse(BytesIO(s)) for s in store.records()]
+        self.stored = len(self.blocks)
+        self.reindex()
+
+    def unmapBlocks(self, keep=True):
+        # closes the map of mapped blocks before the log changes under it;
+        # with keep, the blocks are parsed into a list first
+        if isinstance(self.blocks, MappedBlocks):
+            blocks = list(self.blocks) if keep else []
+            self.blocks.close()
+            self.blocks = blocks
 
     def loadTxData(self):
         with open(self.getTxDataFile(), 'rb') as f:
             self.txs = self.parseTxs(BytesIO(f.read()))
     
 
+    def reindex(self):
+        # outputs maps the SEC of a one-time address to
+        # (height, tx position, output index) where the miner tx is at
+        # position 0 and block.txs follow, as in Block.serialize
+        # keyImages holds the SEC of every key image spent in a block
+        # both are filled on the first lookup, see updateIndex
+        self.outputs = {}
+        self.keyImages = set()
+        self.indexed = 0
+
+    def indexBlocks(self):
+        # adds the outputs and key images of the blocks appended since
+        # the last call; an address seen twice keeps its first output
+        for height, b in enumerate(self.scanBlocks(self.indexed), self.indexed):
+            for position, tx in enumerate([b.miner] + b.txs):
+                for index, out in enumerate(tx.tx_outs):
+                    self.outputs.setdefault(out.oneTimeAddr.sec(), (height, position, index))
+            for image in b.getKeyImages():
+                self.keyImages.add(image.sec())
+        self.indexed = len(self.blocks)
+
+    def rollback(self, height):
+        # forgets what indexBlocks added for the blocks from height on,
+        # before a reorg drops them
+        for b in self.scanBlocks(height, self.indexed):
+            for tx in [b.miner] + b.txs:
+                for out in tx.tx_outs:
+                    key = out.oneTimeAddr.sec()
+                    if key in self.outputs and self.outputs[key][0] >= height:
+                        del self.outputs[key]
+            for image in b.getKeyImages():
+                self.keyImages.discard(image.sec())
+        self.indexed = min(self.indexed, height)
+
+    def scanBlocks(self, start, stop=None):
+        # self.blocks[start:stop] for indexing: mapped blocks are parsed
+        # one at a time and not kept, see MappedBlocks.scan
+        if isinstance(self.blocks, MappedBlocks):
+            return self.blocks.scan(start, stop)
+        return self.blocks[start:stop]
+
+    def updateIndex(self):
+        # catches up with blocks appended to self.blocks directly, and
+        # starts over if the list got shorter
+        if self.indexed > len(self.blocks):
+            self.reindex()
+        self.indexBlocks()
+
+    def isSpent(self, keyImage):
+        self.updateIndex()
+        return keyImage.sec() in self.keyImages
+
+    def findOutput(self, oneTimeAddr):
+        # (height, tx position, output index, TxOut) or None
+        self.updateIndex()
+        found = self.outputs.get(oneTimeAddr.sec())
+        if found is None:
+            return None
+        height, position, index = found
+        b = self.blocks[height]
+        return height, position, index, ([b.miner] + b.txs)[position].tx_outs[index]
+
     def searchOneTimeAddr(self, oneTimeAddr):
-        for b in self.blocks:
-            if oneTimeAddr == b.miner.tx_outs[0].oneTimeAddr:
-                return b.miner.tx_outs[0]
-            for tx in b.txs:
-                for index in range(len(tx.tx_outs)):
-                    if tx.tx_outs[index].oneTimeAddr == oneTimeAddr:
-                        return tx.tx_outs[index]
-        return None
+        found = self.findOutput(oneTimeAddr)
+        if found is None:
+            return None
+        return found[3]
     
     def searchOneTimeAddrIndex(self, oneTimeAddr):
-        for b in self.blocks:
-            if oneTimeAddr == b.miner.tx_outs[0].oneTimeAddr:
-                return 0
-            for tx in b.txs:
-                for index in range(len(tx.tx_outs)):
-                    if tx.tx_outs[index].oneTimeAddr == oneTimeAddr:
-                        return index
-        return None
+        found = self.findOutput(oneTimeAddr)
+        if found is None:
+            return None
+        return found[2]
 
     def selectOneTimeAddr(self):
         b = random.randint(0, len(self.blocks) - 1)
@@ -166,12 +274,25 @@ class Chain:
             images += b.getKeyImages()
         return images
     
-    def verifyBlocks(self):
+    def acceptsTx(self, tx):
+        # a tx signed with the H_p version of the chain, or a miner tx
+        return tx.ringVersion() in (None, self.ringVersion)
+
+    def verifyBlocks(self, verifier=None):
         # verify blocks
         if self.blocks[0].prev_block != '0' * 64:
             return False
+        rings = True
+        if verifier is not None:
+            # inputs of the whole chain in one parallel batch
+            jobs = []
+            for b in self.blocks:
+                jobs += b.ringJobs()
+            if not all(verifier.verify(jobs)):
+                return False
+            rings = False
         for b in self.blocks:
-            if not b.verify():
+            if not b.verify(rings=rings, ringVersion=self.ringVersion):
                 return False
         # verify key images
         images = self.getKeyImages()
@@ -180,12 +301,11 @@ class Chain:
         return True
     
     def verifyTxs(self):
-        images = self.getKeyImages()
         for tx in self.txs:
-            if not tx.verify():
+            if not self.acceptsTx(tx) or not tx.verify():
                 return False
             for i in tx.getKeyImages():
-                if i in images:
+                if self.isSpent(i):
                     return False
         return True
     
@@ -196,7 +316,7 @@ class Chain:
         # at most 5 tx per block
         while len(txs) < 5 and len(self.txs) > 0:
             to_be_added = self.txs.pop()
-            if not to_be_added.verify():
+            if not self.acceptsTx(to_be_added) or not to_be_added.verify():
                 raise RuntimeError("Cannot mine with invalid tx")
             txs.append(to_be_added)
         
@@ -204,60 +324,65 @@ class Chain:
         block = Block(prev=self.blocks[-1].hash(), txs = txs)
         block.createMiner(pubKeyPair=pubKeyPair)
         block.pow()
-        if not block.verify():
+        if not block.verify(ringVersion=self.ringVersion):
             raise RuntimeError("Mined block does not pass verification")
         
         # double spending check
-        images = self.getKeyImages()
         for i in block.getKeyImages():
-            if i in images:
+            if self.isSpent(i):
                 raise RuntimeError("Discovered double spending")
         
         self.blocks.append(block)
+        self.indexBlocks()
 
-        self.dumpBlockData()
+        self.appendBlockData(len(self.blocks) - 1)
         self.dumpTxData()
         
 
-    def replace(self, blocks):
-        longer = self.__class__(name = self.name, blocks = blocks)
-        if not longer.verifyBlocks():
+    def replace(self, blocks, verifier=None):
+        longer = self.__class__(name = self.name, blocks = blocks, ringVersion = self.ringVersion)
+        if not longer.verifyBlocks(verifier):
             raise RuntimeError("Invalid chain received")
-        if (len(blocks) > len(self.blocks)) or (not self.verifyBlocks()):
+        if (len(blocks) > len(self.blocks)) or (not self.verifyBlocks(verifier)):
+            # the index of the blocks both chains share is kept
+            fork = 0
+            while fork < min(len(blocks), len(self.blocks)) and \
+                    blocks[fork].hash() == self.blocks[fork].hash():
+                fork += 1
+            self.rollback(fork)
+            self.unmapBlocks(keep=False)
             self.blocks = blocks
+            self.indexBlocks()
+            self.appendBlockData(fork)
         
             # cleanup tx
-            images = self.getKeyImages()
             for tx in self.txs:
-                if not tx.verify():
+                if not self.acceptsTx(tx) or not tx.verify(verifier):
                     self.txs.remove(tx)            
                 for i in tx.getKeyImages():
-                    if i in images:
+                    if self.isSpent(i):
                         self.txs.remove(tx)
                         break
-            self.dumpBlockData()
             self.dumpTxData()
 
 
     def add_tx(self, tx):
-        if not tx.verify():
+        if not self.acceptsTx(tx) or not tx.verify():
             raise RuntimeError("Invalid tx to be added")
-        images = self.getKeyImages()
         for i in tx.getKeyImages():
-            if i in images:
+            if self.isSpent(i):
                 raise RuntimeError("Discovered double spending")
         self.txs.append(tx)
         self.dumpTxData()
     
 
     def replace_tx(self, txs):
-        images = self.getKeyImages()
         for tx in txs:
             try:
-                if not tx.verify():
+                if not self.acceptsTx(tx) or not tx.verify():
                     raise RuntimeError("Invalid tx to be added")
                 for i in tx.getKeyImages():
-                    if i in images:
+                    if self.isSpent(i):
                         raise RuntimeError("Discovered double spending")
                 if tx not in self.txs:
                     self.txs.append(tx)
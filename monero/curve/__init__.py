@@ -0,0 +1,78 @@
+'''secp256k1 arithmetic shared by every project in this repository.
+
+The implementation is picked from BACKENDS by the ECC_BACKEND environment
+variable when the package is first imported:
+
+    reference  the original affine FieldElement/Point code
+    optimized  Jacobian coordinates, window tables, GLV and multi-scalar
+               multiplication (default)
+    gmpy2      the optimized engine with gmpy2 integers for the field,
+               falls back to optimized if gmpy2 is not installed
+
+The names of the selected backend are re-exported here together with
+hash_to_curve, so ecc.py only has to do `from curve import *`. Other
+backends stay loadable with load_backend, which is what the differential
+tests do.'''
+import importlib
+import importlib.util
+import os
+import sys
+import warnings
+
+from .hashing import hash_to_curve
+
+BACKEND_ENV = 'ECC_BACKEND'
+DEFAULT_BACKEND = 'optimized'
+
+# name: (module in this package, integer library for the field or None)
+BACKENDS = {
+    'reference': ('reference', None),
+    'optimized': ('optimized', None),
+    'gmpy2': ('optimized', 'gmpy2'),
+}
+
+_loaded = {}
+
+
+def load_backend(name):
+    '''returns the module implementing the named backend, raises ValueError
+    for an unknown name and ImportError if its integer library is missing'''
+    if name in _loaded:
+        return _loaded[name]
+    if name not in BACKENDS:
+        raise ValueError('Unknown ECC backend {}, expected one of {}'.format(
+            name, ', '.join(sorted(BACKENDS))))
+    source, library = BACKENDS[name]
+    if library is None:
+        module = importlib.import_module('.' + source, __name__)
+    else:
+        mpz = importlib.import_module(library).mpz
+        # run the source again as a separate module with mpz coordinates,
+        # leaving the int version importable next to it
+        origin = importlib.util.find_spec('.' + source, __name__).origin
+        spec = importlib.util.spec_from_file_location(
+            '{}.{}'.format(__name__, name), origin)
+        module = importlib.util.module_from_spec(spec)
+        module.mpz = mpz
+        sys.modules[spec.name] = module
+        spec.loader.exec_module(module)
+    _loaded[name] = module
+    return module
+
+
+def select_backend():
+    '''loads the backend named by ECC_BACKEND'''
+    name = os.environ.get(BACKEND_ENV) or DEFAULT_BACKEND
+    try:
+        return name, load_backend(name)
+    except ImportError as e:
+        warnings.warn('ECC backend {} is not available ({}), using {}'.format(
+            name, e, DEFAULT_BACKEND), RuntimeWarning)
+        return DEFAULT_BACKEND, load_backend(DEFAULT_BACKEND)
+
+
+BACKEND, backend = select_backend()
+
+_names = [name for name in vars(backend) if not name.startswith('_')]
+globals().update((name, getattr(backend, name)) for name in _names)
+__all__ = _names + ['hash_to_curve']
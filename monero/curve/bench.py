@@ -0,0 +1,162 @@
+'''Micro-benchmarks for the curve backends.
+
+    python -m curve.bench [--backend NAME] [--json FILE]
+                          [--baseline FILE] [--tolerance PERCENT]
+
+Prints ops/sec and the peak memory allocated by one call for each
+benchmark. --json writes the same numbers as JSON, which can be passed
+back as --baseline on a later run: the exit status is 1 if any benchmark
+got slower than the baseline by more than the tolerance.
+
+The parse and table caches are turned off while measuring, so repeated
+inputs do not turn variable-base work into cache hits.'''
+import argparse
+import contextlib
+import itertools
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+from . import BACKEND, load_backend
+
+POOL_SIZE = 64
+BATCH_SIZE = 16
+
+
+def cycle(items):
+    '''returns a function giving the items one after another, forever'''
+    return itertools.cycle(items).__next__
+
+
+def benchmarks(ecc, seed=0):
+    '''returns {name: function} with inputs drawn from a seeded generator'''
+    rand = random.Random(seed)
+    scalars = [rand.randrange(1, ecc.N) for _ in range(POOL_SIZE)]
+    nums = [rand.randrange(1, ecc.P) for _ in range(POOL_SIZE)]
+    keys = [ecc.PrivateKey(scalar) for scalar in scalars[:BATCH_SIZE]]
+    points = [key.point for key in keys]
+    signed = [(key.point, z, key.sign(z)) for key, z in zip(keys, scalars)]
+    encoded = [point.sec() for point in points]
+    elements = [ecc.S256Field(num) for num in nums]
+    one = ecc.S256Field(1)
+    terms = list(zip(scalars, points))
+
+    scalar, num, element = cycle(scalars), cycle(nums), cycle(elements)
+    point, item, sec = cycle(points), cycle(signed), cycle(encoded)
+    key = cycle(keys)
+    return {
+        'field_mul': lambda: element() * element(),
+        'field_inv': lambda: one / element(),
+        'point_add': lambda: point() + point(),
+        'point_double': lambda: (lambda p: p + p)(point()),
+        'mul_fixed': lambda: scalar() * ecc.G,
+        'mul_variable': lambda: scalar() * point(),
+        'sec': lambda: point().sec(compressed=False),
+        'parse': lambda: ecc.S256Point.parse(sec()),
+        'sign': lambda: key().sign(num()),
+        'verify': lambda: (lambda p, z, sig: p.verify(z, sig))(*item()),
+        'multi_mul_{}'.format(BATCH_SIZE): lambda: ecc.multi_mul(terms),
+    }
+
+
+@contextlib.contextmanager
+def caches_off(ecc):
+    '''empties and turns off the parse and table caches of the backends
+    that have them, for the duration of the block'''
+    if not hasattr(ecc, 'TABLE_CACHE'):
+        yield
+        return
+    size, budget = ecc.PARSE_CACHE.size, ecc.TABLE_CACHE.budget
+    ecc.PARSE_CACHE.resize(0)
+    ecc.TABLE_CACHE.resize(0)
+    try:
+        yield
+    finally:
+        ecc.PARSE_CACHE.resize(size)
+        ecc.TABLE_CACHE.resize(budget)
+
+
+def measure(func, min_time):
+    '''returns (ops per second, peak bytes allocated by one call)'''
+    func()
+    count = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(count):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            break
+        count *= 2
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return count / elapsed, peak
+
+
+def run(backend=BACKEND, names=None, min_time=0.2):
+    '''runs the benchmarks (all of them unless names are given) and returns
+    the results as a dict ready for JSON'''
+    ecc = load_backend(backend)
+    results = {}
+    with caches_off(ecc):
+        for name, func in benchmarks(ecc).items():
+            if names and name not in names:
+                continue
+            ops, peak = measure(func, min_time)
+            results[name] = {'ops_per_sec': ops, 'alloc_bytes': peak}
+    return {
+        'backend': backend,
+        'python': platform.python_version(),
+        'benchmarks': results,
+    }
+
+
+def compare(results, baseline, tolerance):
+    '''returns (name, ops/sec, baseline ops/sec) for every benchmark more
+    than tolerance percent slower than in the baseline'''
+    regressions = []
+    for name, result in results['benchmarks'].items():
+        expected = baseline['benchmarks'].get(name)
+        if expected is None:
+            continue
+        if result['ops_per_sec'] < expected['ops_per_sec'] * (1 - tolerance / 100):
+            regressions.append((name, result['ops_per_sec'], expected['ops_per_sec']))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m curve.bench', description=__doc__.split('\n')[0])
+    parser.add_argument('names', nargs='*', help='benchmarks to run, all by default')
+    parser.add_argument('--backend', default=BACKEND)
+    parser.add_argument('--json', help='write the results to this file')
+    parser.add_argument('--baseline', help='results of an earlier run to compare against')
+    parser.add_argument('--tolerance', type=float, default=10, help='allowed slowdown in percent')
+    parser.add_argument('--min-time', type=float, default=0.2, help='seconds per benchmark')
+    args = parser.parse_args(argv)
+
+    results = run(args.backend, args.names, args.min_time)
+    print('backend {}, python {}'.format(results['backend'], results['python']))
+    for name, result in results['benchmarks'].items():
+        print('{:<18} {:>12.1f} ops/s {:>10} bytes'.format(
+            name, result['ops_per_sec'], result['alloc_bytes']))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        for name, ops, expected in regressions:
+            print('{} regressed: {:.1f} ops/s, baseline {:.1f} ops/s'.format(name, ops, expected))
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,26 @@
+'''Hashing to points of the selected backend.'''
+import hashlib
+import itertools
+
+
+def hash_to_curve(data):
+    '''try-and-increment: hashes data with a 4-byte counter until the digest
+    is the x coordinate of a curve point, returns the one with even y'''
+    # the package picks its backend after importing this module
+    from . import backend
+    P, B = int(backend.P), int(backend.B)
+    for counter in itertools.count():
+        digest = hashlib.sha256(data + counter.to_bytes(4, 'big')).digest()
+        x = int.from_bytes(digest, 'big')
+        if x >= P:
+            continue
+        # the candidates are decompressed here rather than through
+        # S256Point.parse, whose cache would fill up with them
+        alpha = (pow(x, 3, P) + B) % P
+        y = pow(alpha, (P + 1) // 4, P)
+        if y * y % P != alpha:
+            # x**3 + 7 has no square root
+            continue
+        if y % 2:
+            y = P - y
+        return backend.S256Point(x, y)
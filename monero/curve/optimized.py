@@ -0,0 +1,1058 @@
+from collections import OrderedDict
+from io import BytesIO
+
+import hashlib
+import hmac
+
+from helper import encode_base58_checksum, hash160
+
+
+class FieldElement:
+
+    __slots__ = ('num', 'prime')
+
+    def __init__(self, num, prime):
+        if num >= prime or num < 0:
+            error = 'Num {} not in field range 0 to {}'.format(
+                num, prime - 1)
+            raise ValueError(error)
+        self.num = num
+        self.prime = prime
+
+    def __repr__(self):
+        return 'FieldElement_{}({})'.format(self.prime, self.num)
+
+    def __eq__(self, other):
+        if other is None:
+            return False
+        return self.num == other.num and self.prime == other.prime
+
+    def __ne__(self, other):
+        # this should be the inverse of the == operator
+        return not (self == other)
+
+    def __add__(self, other):
+        if self.prime != other.prime:
+            raise TypeError('Cannot add two numbers in different Fields')
+        # self.num and other.num are the actual values
+        # self.prime is what we need to mod against
+        num = (self.num + other.num) % self.prime
+        # We return an element of the same class
+        return self.__class__(num, self.prime)
+
+    def __sub__(self, other):
+        if self.prime != other.prime:
+            raise TypeError('Cannot subtract two numbers in different Fields')
+        # self.num and other.num are the actual values
+        # self.prime is what we need to mod against
+        num = (self.num - other.num) % self.prime
+        # We return an element of the same class
+        return self.__class__(num, self.prime)
+
+    def __mul__(self, other):
+        if self.prime != other.prime:
+            raise TypeError('Cannot multiply two numbers in different Fields')
+        # self.num and other.num are the actual values
+        # self.prime is what we need to mod against
+        num = (self.num * other.num) % self.prime
+        # We return an element of the same class
+        return self.__class__(num, self.prime)
+
+    def __pow__(self, exponent):
+        n = exponent % (self.prime - 1)
+        num = pow(self.num, n, self.prime)
+        return self.__class__(num, self.prime)
+
+    def __truediv__(self, other):
+        if self.prime != other.prime:
+            raise TypeError('Cannot divide two numbers in different Fields')
+        # self.num and other.num are the actual values
+        # self.prime is what we need to mod against
+        # use fermat's little theorem:
+        # self.num**(p-1) % p == 1
+        # this means:
+        # 1/n == pow(n, p-2, p)
+        num = (self.num * pow(other.num, self.prime - 2, self.prime)) % self.prime
+        # We return an element of the same class
+        return self.__class__(num, self.prime)
+
+    def __rmul__(self, coefficient):
+        num = (self.num * coefficient) % self.prime
+        return self.__class__(num=num, prime=self.prime)
+
+
+class Point:
+
+    __slots__ = ('a', 'b', 'x', 'y')
+
+    def __init__(self, x, y, a, b):
+        self.a = a
+        self.b = b
+        self.x = x
+        self.y = y
+        # x being None and y being None represents the point at infinity
+        # Check for that here since the equation below won't make sense
+        # with None values for both.
+        if self.x is None and self.y is None:
+            return
+        # make sure that the elliptic curve equation is satisfied
+        # y**2 == x**3 + a*x + b
+        if self.y**2 != self.x**3 + a * x + b:
+            # if not, throw a ValueError
+            raise ValueError('({}, {}) is not on the curve'.format(x, y))
+
+    @classmethod
+    def trusted(cls, x, y, a, b):
+        '''builds a point that is on the curve by construction, such as the
+        result of an addition, without checking the curve equation'''
+        point = object.__new__(cls)
+        point.a = a
+        point.b = b
+        point.x = x
+        point.y = y
+        return point
+
+    def __eq__(self, other):
+        return self.x == other.x and self.y == other.y \
+            and self.a == other.a and self.b == other.b
+
+    def __ne__(self, other):
+        # this should be the inverse of the == operator
+        return not (self == other)
+
+    def __repr__(self):
+        if self.x is None:
+            return 'Point(infinity)'
+        elif isinstance(self.x, FieldElement):
+            return 'Point({},{})_{}_{} FieldElement({})'.format(
+                self.x.num, self.y.num, self.a.num, self.b.num, self.x.prime)
+        else:
+            return 'Point({},{})_{}_{}'.format(self.x, self.y, self.a, self.b)
+
+    def __add__(self, other):
+        if self.a != other.a or self.b != other.b:
+            raise TypeError('Points {}, {} are not on the same curve'.format(self, other))
+        # Case 0.0: self is the point at infinity, return other
+        if self.x is None:
+            return other
+        # Case 0.1: other is the point at infinity, return self
+        if other.x is None:
+            return self
+
+        # Case 1: self.x == other.x, self.y != other.y
+        # Result is point at infinity
+        if self.x == other.x and self.y != other.y:
+            return self.trusted(None, None, self.a, self.b)
+
+        # Case 2: self.x ≠ other.x
+        # Formula (x3,y3)==(x1,y1)+(x2,y2)
+        # s=(y2-y1)/(x2-x1)
+        # x3=s**2-x1-x2
+        # y3=s*(x1-x3)-y1
+        if self.x != other.x:
+            s = (other.y - self.y) / (other.x - self.x)
+            x = s**2 - self.x - other.x
+            y = s * (self.x - x) - self.y
+            return self.trusted(x, y, self.a, self.b)
+
+        # Case 4: if we are tangent to the vertical line,
+        # we return the point at infinity
+        # note instead of figuring out what 0 is for each type
+        # we just use 0 * self.x
+        if self == other and self.y == 0 * self.x:
+            return self.trusted(None, None, self.a, self.b)
+
+        # Case 3: self == other
+        # Formula (x3,y3)=(x1,y1)+(x1,y1)
+        # s=(3*x1**2+a)/(2*y1)
+        # x3=s**2-2*x1
+        # y3=s*(x1-x3)-y1
+        if self == other:
+            s = (3 * self.x**2 + self.a) / (2 * self.y)
+            x = s**2 - 2 * self.x
+            y = s * (self.x - x) - self.y
+            return self.trusted(x, y, self.a, self.b)
+
+    def __rmul__(self, coefficient):
+        coef = coefficient
+        current = self
+        result = self.trusted(None, None, self.a, self.b)
+        while coef:
+            if coef & 1:
+                result += current
+            current += current
+            coef >>= 1
+        return result
+
+
+# integer type of the coordinates: int here, gmpy2.mpz when the curve
+# package loads this module as the gmpy2 backend (mpz is set beforehand)
+if 'mpz' not in globals():
+    mpz = int
+
+A = 0
+B = 7
+# with P an mpz, every coordinate reduced mod P becomes an mpz as well
+P = mpz(2**256 - 2**32 - 977)
+N = 0xfffffffffffffffffffffffffffffffebaaedce6af48a03bbfd25e8cd0364141
+# endomorphism: LAMBDA * (x, y) == (BETA * x, y)
+BETA = 0x7ae96a2b657c07106e64479eac3434e99cf0497512f58995c1396c28719501ee
+LAMBDA = 0x5363ad4cc05c30e0a5261c028812645a122e22ea20816678df02967c1b23bd72
+# short basis (a1, b1), (a2, b2) of the lattice {(k1, k2): k1 + k2 * LAMBDA == 0}
+GLV_A1 = 0x3086d221a7d46bcde86c90e49284eb15
+GLV_B1 = -0xe4437ed6010e88286f547fa90abfe4c3
+GLV_A2 = 0x114ca50f7a8e2f3f657c1108d9d44cfd8
+GLV_B2 = GLV_A1
+
+
+def jacobian_double(p):
+    '''doubles a point in Jacobian coordinates on y**2 = x**3 + 7'''
+    if p is None:
+        return None
+    X, Y, Z = p
+    if Y == 0:
+        return None
+    YY = Y * Y % P
+    S = 4 * X * YY % P
+    M = 3 * X * X % P
+    X3 = (M * M - 2 * S) % P
+    Y3 = (M * (S - X3) - 8 * YY * YY) % P
+    Z3 = 2 * Y * Z % P
+    return (X3, Y3, Z3)
+
+
+def jacobian_add(p, q):
+    '''adds two points in Jacobian coordinates without any inversion'''
+    if p is None:
+        return q
+    if q is None:
+        return p
+    X1, Y1, Z1 = p
+    X2, Y2, Z2 = q
+    Z1Z1 = Z1 * Z1 % P
+    Z2Z2 = Z2 * Z2 % P
+    U1 = X1 * Z2Z2 % P
+    U2 = X2 * Z1Z1 % P
+    S1 = Y1 * Z2 * Z2Z2 % P
+    S2 = Y2 * Z1 * Z1Z1 % P
+    if U1 == U2:
+        if S1 != S2:
+            # p == -q
+            return None
+        return jacobian_double(p)
+    H = (U2 - U1) % P
+    R = (S2 - S1) % P
+    HH = H * H % P
+    HHH = H * HH % P
+    V = U1 * HH % P
+    X3 = (R * R - HHH - 2 * V) % P
+    Y3 = (R * (V - X3) - S1 * HHH) % P
+    Z3 = Z1 * Z2 * H % P
+    return (X3, Y3, Z3)
+
+
+def jacobian_add_affine(p, q):
+    '''adds a Jacobian point p and an affine point q = (x, y)'''
+    if p is None:
+        return (q[0], q[1], 1)
+    X1, Y1, Z1 = p
+    Z1Z1 = Z1 * Z1 % P
+    U2 = q[0] * Z1Z1 % P
+    S2 = q[1] * Z1 * Z1Z1 % P
+    if U2 == X1:
+        if S2 != Y1:
+            return None
+        return jacobian_double(p)
+    H = (U2 - X1) % P
+    R = (S2 - Y1) % P
+    HH = H * H % P
+    HHH = H * HH % P
+    V = X1 * HH % P
+    X3 = (R * R - HHH - 2 * V) % P
+    Y3 = (R * (V - X3) - Y1 * HHH) % P
+    Z3 = Z1 * H % P
+    return (X3, Y3, Z3)
+
+
+def jacobian_equal(p, q):
+    '''compares two Jacobian points without converting them to affine'''
+    if p is None or q is None:
+        return p is None and q is None
+    # compare X1/Z1**2 == X2/Z2**2 and Y1/Z1**3 == Y2/Z2**3
+    # by cross multiplying instead of inverting
+    z1z1 = p[2] * p[2] % P
+    z2z2 = q[2] * q[2] % P
+    if p[0] * z2z2 % P != q[0] * z1z1 % P:
+        return False
+    return p[1] * z2z2 * q[2] % P == q[1] * z1z1 * p[2] % P
+
+
+def jacobian_to_affine(p):
+    '''returns (x, y) as integers, or None for the point at infinity'''
+    if p is None:
+        return None
+    X, Y, Z = p
+    if Z == 1:
+        return (X, Y)
+    z_inv = pow(Z, -1, P)
+    z_inv2 = z_inv * z_inv % P
+    return (X * z_inv2 % P, Y * z_inv2 * z_inv % P)
+
+
+def glv_split(k):
+    '''returns (k1, k2), each about 128 bits and possibly negative,
+    with k1 + k2 * LAMBDA == k mod N'''
+    c1 = (GLV_B2 * k + N // 2) // N
+    c2 = (-GLV_B1 * k + N // 2) // N
+    k1 = k - c1 * GLV_A1 - c2 * GLV_A2
+    k2 = -c1 * GLV_B1 - c2 * GLV_B2
+    return k1, k2
+
+
+def glv_terms(k, p):
+    '''rewrites k * p as two half-length (scalar, jacobian) terms using
+    the endomorphism, with the signs moved onto the points'''
+    if p is None:
+        return []
+    X, Y, Z = p
+    k1, k2 = glv_split(k)
+    terms = []
+    for scalar, x in ((k1, X), (k2, BETA * X % P)):
+        if scalar < 0:
+            terms.append((-scalar, (x, P - Y, Z)))
+        elif scalar:
+            terms.append((scalar, (x, Y, Z)))
+    return terms
+
+
+def batch_to_affine(jacobians):
+    '''converts a list of Jacobian points to affine (x, y) tuples with a
+    single inversion (Montgomery's trick); infinity stays None'''
+    # prefix[i] is the product of all Z before the i-th point
+    prefix = []
+    acc = 1
+    for p in jacobians:
+        prefix.append(acc)
+        if p is not None:
+            acc = acc * p[2] % P
+    inv = pow(acc, -1, P)
+    result = [None] * len(jacobians)
+    for i in reversed(range(len(jacobians))):
+        p = jacobians[i]
+        if p is None:
+            continue
+        X, Y, Z = p
+        # inv is 1 / (Z_0 * ... * Z_i), so 1/Z_i = inv * prefix[i]
+        z_inv = inv * prefix[i] % P
+        inv = inv * Z % P
+        z_inv2 = z_inv * z_inv % P
+        result[i] = (X * z_inv2 % P, Y * z_inv2 * z_inv % P)
+    return result
+
+
+def normalize_batch(points):
+    '''computes the affine coordinates of every S256Point in the list that
+    does not have them yet, with one inversion for all of them'''
+    pending = [p for p in points if not p.is_normalized()]
+    for point, affine in zip(pending, batch_to_affine([p.jacobian for p in pending])):
+        point.set_affine(affine)
+
+
+class FixedBaseTable:
+    '''Precomputed multiples of a point that gets multiplied over and over.
+
+    Row i holds d * 16**i * point for d in 1..15 in affine coordinates, so
+    scalar * point takes one mixed addition per 4-bit window of the scalar
+    and no doublings. The rows are built on first use.'''
+
+    WIDTH = 4
+    # approximate memory of the built rows (960 affine points), measured
+    # with sys.getsizeof
+    BYTES = 180 << 10
+
+    def __init__(self, point):
+        self.point = point
+        self.rows = None
+
+    def build(self):
+        rows = []
+        base = self.point.jacobian
+        for i in range(256 // self.WIDTH):
+            multiples = [None, base]
+            for d in range(2, 1 << self.WIDTH):
+                multiples.append(jacobian_add(multiples[-1], base))
+            rows.append(multiples)
+            # next base is 16 * base
+            for _ in range(self.WIDTH):
+                base = jacobian_double(base)
+        # one inversion for the whole table
+        flat = batch_to_affine([m for row in rows for m in row[1:]])
+        step = (1 << self.WIDTH) - 1
+        self.rows = [[None] + flat[i:i + step] for i in range(0, len(flat), step)]
+
+    def mul(self, coefficient, result=None):
+        '''returns coefficient * point in Jacobian coordinates, added to the
+        Jacobian point result if given; there are no doublings, so several
+        tables can share one accumulator'''
+        if self.rows is None:
+            self.build()
+        mask = (1 << self.WIDTH) - 1
+        coef = coefficient % N
+        for row in self.rows:
+            if not coef:
+                break
+            d = coef & mask
+            if d:
+                result = jacobian_add_affine(result, row[d])
+            coef >>= self.WIDTH
+        return result
+
+
+class PointCache:
+    '''Bounded LRU cache of points keyed by bytes, with hit/miss counters.
+    A size of 0 disables the cache.
+
+    Threads serving requests share it without a lock, which a forked
+    worker could inherit held: a key evicted by another thread between a
+    lookup and its move to the end is simply left out.'''
+
+    def __init__(self, size):
+        self.size = size
+        self.points = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.points)
+
+    def get(self, key):
+        point = self.points.get(key)
+        if point is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        try:
+            self.points.move_to_end(key)
+        except KeyError:
+            pass
+        return point
+
+    def put(self, key, point):
+        if self.size <= 0:
+            return
+        self.points[key] = point
+        try:
+            self.points.move_to_end(key)
+        except KeyError:
+            pass
+        self.evict(self.size)
+
+    def resize(self, size):
+        self.size = size
+        self.evict(size)
+
+    def evict(self, size):
+        '''drops the least recently used points down to size'''
+        while len(self.points) > max(size, 0):
+            try:
+                self.points.popitem(last=False)
+            except KeyError:
+                # emptied by another thread
+                break
+
+    def clear(self):
+        self.points.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def stats(self):
+        return {
+            'size': len(self.points),
+            'max_size': self.size,
+            'hits': self.hits,
+            'misses': self.misses,
+        }
+
+
+# number of decompressed points kept by S256Point.parse
+PARSE_CACHE_SIZE = 1 << 14
+PARSE_CACHE = PointCache(PARSE_CACHE_SIZE)
+
+
+class TableCache:
+    '''FixedBaseTables for points that keep being multiplied, such as ring
+    members used by many transactions. Uses are counted per point (keyed by
+    its compressed SEC) and a table is built on the threshold-th use. Only
+    points parsed or already affine are counted: keying an arithmetic
+    result would cost an inversion on every multiplication. Tables
+    are evicted least recently used first to stay within budget bytes.
+    A budget below the size of one table disables the cache.
+    Like PointCache it is shared between threads without a lock.'''
+
+    def __init__(self, threshold, budget, tracked):
+        self.threshold = threshold
+        self.budget = budget
+        # at most this many cold points have their uses counted
+        self.tracked = tracked
+        self.tables = OrderedDict()
+        self.uses = OrderedDict()
+        self.hits = 0
+        self.builds = 0
+
+    def __len__(self):
+        return len(self.tables)
+
+    def lookup(self, point):
+        '''returns the table of a hot point, None for a cold one'''
+        if self.budget < FixedBaseTable.BYTES or point.jacobian is None:
+            return None
+        if point.encoded is None and point.affine is None:
+            return None
+        key = point.sec()
+        table = self.tables.get(key)
+        if table is not None:
+            self.hits += 1
+            try:
+                self.tables.move_to_end(key)
+            except KeyError:
+                # evicted by another thread meanwhile
+                pass
+            return table
+        uses = self.uses.pop(key, 0) + 1
+        if uses < self.threshold:
+            self.uses[key] = uses
+            while len(self.uses) > self.tracked:
+                try:
+                    self.uses.popitem(last=False)
+                except KeyError:
+                    break
+            return None
+        table = FixedBaseTable(point)
+        table.build()
+        self.builds += 1
+        self.tables[key] = table
+        self.resize(self.budget)
+        return table
+
+    def resize(self, budget):
+        self.budget = budget
+        while self.tables and len(self.tables) * FixedBaseTable.BYTES > budget:
+            try:
+                self.tables.popitem(last=False)
+            except KeyError:
+                break
+
+    def clear(self):
+        self.tables.clear()
+        self.uses.clear()
+        self.hits = 0
+        self.builds = 0
+
+    def stats(self):
+        return {
+            'tables': len(self.tables),
+            'bytes': len(self.tables) * FixedBaseTable.BYTES,
+            'budget': self.budget,
+            'tracked': len(self.uses),
+            'hits': self.hits,
+            'builds': self.builds,
+        }
+
+
+# building a table costs about a dozen variable-base multiplications
+TABLE_CACHE_THRESHOLD = 16
+TABLE_CACHE_BUDGET = 32 << 20
+TABLE_CACHE = TableCache(TABLE_CACHE_THRESHOLD, TABLE_CACHE_BUDGET, 1 << 14)
+
+
+class S256Field(FieldElement):
+
+    __slots__ = ()
+
+    def __init__(self, num, prime=None):
+        super().__init__(num=num, prime=P)
+
+    def __repr__(self):
+        return '{:x}'.format(self.num).zfill(64)
+
+    # every S256Field shares the same prime, so arithmetic skips the
+    # field check and the range check of __init__
+
+    def __add__(self, other):
+        return s256_field((self.num + other.num) % P)
+
+    def __sub__(self, other):
+        return s256_field((self.num - other.num) % P)
+
+    def __mul__(self, other):
+        return s256_field(self.num * other.num % P)
+
+    def __rmul__(self, coefficient):
+        return s256_field(self.num * coefficient % P)
+
+    def __pow__(self, exponent):
+        return s256_field(pow(self.num, exponent % (P - 1), P))
+
+    def __truediv__(self, other):
+        return s256_field(self.num * pow(other.num, -1, P) % P)
+
+    def sqrt(self):
+        return self**((P + 1) // 4)
+
+
+def s256_field(num):
+    '''builds an S256Field from an integer already reduced mod P'''
+    element = object.__new__(S256Field)
+    element.num = num
+    element.prime = P
+    return element
+
+
+FIELD_A = S256Field(A)
+FIELD_B = S256Field(B)
+
+
+class S256Point(Point):
+
+    # jacobian: (X, Y, Z) integers with x = X/Z**2 and y = Y/Z**3,
+    #   None for the point at infinity
+    # affine: (x, y) integers once known, (None, None) for infinity,
+    #   None while not computed yet
+    # fixed_base: FixedBaseTable used by __rmul__, set for points such as G
+    # encoded: compressed SEC bytes once computed
+    __slots__ = ('jacobian', 'affine', 'fixed_base', 'encoded')
+
+    def __init__(self, x, y, a=None, b=None):
+        self.fixed_base = None
+        self.encoded = None
+        if x is None and y is None:
+            self.jacobian = None
+            self.affine = (None, None)
+            return
+        if isinstance(x, FieldElement):
+            x, y = x.num, y.num
+        for num in (x, y):
+            if num >= P or num < 0:
+                raise ValueError('Num {} not in field range 0 to {}'.format(num, P - 1))
+        # make sure that y**2 == x**3 + 7
+        if (y * y - x * x * x - B) % P:
+            raise ValueError('({}, {}) is not on the curve'.format(
+                s256_field(x), s256_field(y)))
+        x, y = mpz(x), mpz(y)
+        self.jacobian = (x, y, 1)
+        self.affine = (x, y)
+
+    @staticmethod
+    def from_jacobian(jacobian):
+        '''returns a point whose affine coordinates are computed lazily; the
+        curve check is skipped since arithmetic results are on the curve'''
+        point = object.__new__(S256Point)
+        point.jacobian = jacobian
+        point.affine = None
+        point.fixed_base = None
+        point.encoded = None
+        return point
+
+    def set_jacobian(self, jacobian):
+        '''initializes a (subclass) instance from an arithmetic result
+        without the curve check done by __init__'''
+        self.jacobian = jacobian
+        self.affine = None
+        self.fixed_base = None
+        self.encoded = None
+
+    def normalize(self):
+        '''converts to affine (one inversion) if not done yet'''
+        if self.affine is None:
+            self.set_affine(jacobian_to_affine(self.jacobian))
+        return self.affine
+
+    def precompute(self):
+        '''gives the point its own FixedBaseTable, for generators such as G
+        that are multiplied all the time; returns the point'''
+        if self.fixed_base is None:
+            self.fixed_base = FixedBaseTable(self)
+        return self
+
+    def is_normalized(self):
+        '''True once the affine coordinates are known'''
+        return self.affine is not None
+
+    def set_affine(self, affine):
+        '''stores affine coordinates (x, y) computed from self.jacobian'''
+        if affine is None:
+            self.affine = (None, None)
+        else:
+            self.affine = affine
+            self.jacobian = (affine[0], affine[1], 1)
+
+    # x, y, a and b keep the FieldElement interface of Point
+
+    @property
+    def x(self):
+        x = self.normalize()[0]
+        return None if x is None else s256_field(x)
+
+    @property
+    def y(self):
+        y = self.normalize()[1]
+        return None if y is None else s256_field(y)
+
+    @property
+    def a(self):
+        return FIELD_A
+
+    @property
+    def b(self):
+        return FIELD_B
+
+    def __repr__(self):
+        if self.jacobian is None:
+            return 'S256Point(infinity)'
+        else:
+            return 'S256Point({}, {})'.format(self.x, self.y)
+
+    def __eq__(self, other):
+        if not isinstance(other, S256Point):
+            return super().__eq__(other)
+        if self.encoded is not None and other.encoded is not None:
+            return self.encoded == other.encoded
+        return jacobian_equal(self.jacobian, other.jacobian)
+
+    def __hash__(self):
+        return hash(self.sec())
+
+    def __neg__(self):
+        if self.jacobian is None:
+            return self
+        X, Y, Z = self.jacobian
+        return self.from_jacobian((X, P - Y, Z))
+
+    def __add__(self, other):
+        return self.from_jacobian(jacobian_add(self.jacobian, other.jacobian))
+
+    def __sub__(self, other):
+        return self + (-other)
+
+    def __rmul__(self, coefficient):
+        table = self.fixed_base or TABLE_CACHE.lookup(self)
+        if table is not None:
+            return self.from_jacobian(table.mul(coefficient))
+        return self.from_jacobian(strauss(glv_terms(coefficient % N, self.jacobian)))
+
+    def verify(self, z, sig):
+        # By Fermat's Little Theorem, 1/s = pow(s, N-2, N)
+        s_inv = pow(sig.s, N - 2, N)
+        # u = z / s
+        u = z * s_inv % N
+        # v = r / s
+        v = sig.r * s_inv % N
+        # u*G + v*P should have as the x coordinate, r
+        total = multi_mul([(u, G), (v, self)])
+        return total.normalize()[0] == sig.r
+
+    def sec(self, compressed=True):
+        '''returns the binary version of the SEC format'''
+        # if compressed, starts with b'\x02' if y is even, b'\x03' if y is odd
+        # then x as 32 bytes big endian
+        if compressed and self.encoded is not None:
+            return self.encoded
+        x, y = map(int, self.normalize())
+        if compressed:
+            if y % 2 == 0:
+                self.encoded = b'\x02' + x.to_bytes(32, 'big')
+            else:
+                self.encoded = b'\x03' + x.to_bytes(32, 'big')
+            return self.encoded
+        else:
+            # if non-compressed, starts with b'\x04' followod by x and then y
+            return b'\x04' + x.to_bytes(32, 'big') + y.to_bytes(32, 'big')
+
+    def hash160(self, compressed=True):
+        return hash160(self.sec(compressed))
+
+    def address(self, compressed=True, testnet=False):
+        '''Returns the address string'''
+        h160 = self.hash160(compressed)
+        if testnet:
+            prefix = b'\x6f'
+        else:
+            prefix = b'\x00'
+        return encode_base58_checksum(prefix + h160)
+
+    @classmethod
+    def parse(self, sec_bin):
+        '''returns a Point object from a SEC binary (not hex)'''
+        # popular outputs are parsed over and over, so decompressed
+        # points are kept in a bounded cache keyed by their encoding
+        key = bytes(sec_bin)
+        point = PARSE_CACHE.get(key)
+        if point is None:
+            point = self.decode(key)
+            if key[0] in (2, 3):
+                # canonical by now, decode rejects any other prefix
+                point.encoded = key
+            PARSE_CACHE.put(key, point)
+        return point
+
+    @staticmethod
+    def decode(sec_bin):
+        '''parses a SEC binary without going through PARSE_CACHE'''
+        # any other prefix would give a second encoding of the same point
+        if len(sec_bin) == 0 or sec_bin[0] not in (2, 3, 4):
+            raise ValueError('Invalid SEC prefix')
+        if len(sec_bin) != (65 if sec_bin[0] == 4 else 33):
+            raise ValueError('Invalid SEC length')
+        if sec_bin[0] == 4:
+            x = int.from_bytes(sec_bin[1:33], 'big')
+            y = int.from_bytes(sec_bin[33:65], 'big')
+            return S256Point(x=x, y=y)
+        is_even = sec_bin[0] == 2
+        x = int.from_bytes(sec_bin[1:], 'big')
+        # right side of the equation y^2 = x^3 + 7
+        alpha = (pow(x, 3, P) + B) % P
+        # solve for left side
+        beta = pow(alpha, (P + 1) // 4, P)
+        if beta % 2 == 0:
+            even_beta = beta
+            odd_beta = P - beta
+        else:
+            even_beta = P - beta
+            odd_beta = beta
+        if is_even:
+            return S256Point(x, even_beta)
+        else:
+            return S256Point(x, odd_beta)
+
+
+G = S256Point(
+    0x79be667ef9dcbbac55a06295ce870b07029bfcdb2dce28d959f2815b16f81798,
+    0x483ada7726a3c4655da4fbfc0e1108a8fd17b448a68554199c47d08ffb10d4b8)
+G.precompute()
+
+
+def wnaf(k, width):
+    '''returns the width-w NAF digits of k, least significant first; every
+    nonzero digit is odd and below 2**(width-1) in absolute value'''
+    digits = []
+    while k:
+        if k & 1:
+            d = k & ((1 << width) - 1)
+            if d >= 1 << (width - 1):
+                d -= 1 << width
+            k -= d
+        else:
+            d = 0
+        digits.append(d)
+        k >>= 1
+    return digits
+
+
+def odd_multiples(p, width):
+    '''returns [p, 3p, 5p, ..., (2**(width-1) - 1)p] in Jacobian coordinates'''
+    double = jacobian_double(p)
+    table = [p]
+    for _ in range((1 << (width - 2)) - 1):
+        table.append(jacobian_add(table[-1], double))
+    return table
+
+
+def strauss(terms, width=5):
+    '''Computes sum(scalar * point) for (scalar, jacobian) pairs with one
+    shared chain of doublings over the wNAF digits of every scalar;
+    returns a Jacobian point'''
+    tables = []
+    nafs = []
+    for scalar, point in terms:
+        if point is None or scalar == 0:
+            continue
+        tables.append(odd_multiples(point, width))
+        nafs.append(wnaf(scalar, width))
+    result = None
+    for i in reversed(range(max(map(len, nafs), default=0))):
+        result = jacobian_double(result)
+        for table, naf in zip(tables, nafs):
+            if i >= len(naf) or not naf[i]:
+                continue
+            d = naf[i]
+            if d > 0:
+                result = jacobian_add(result, table[d >> 1])
+            else:
+                # negative digits use -Q = (X, -Y, Z)
+                X, Y, Z = table[-d >> 1]
+                result = jacobian_add(result, (X, P - Y, Z))
+    return result
+
+
+def pippenger_window(n, bits=256):
+    '''picks the bucket width minimizing the estimated number of additions'''
+    best, best_cost = 1, None
+    for c in range(1, 17):
+        cost = -(-bits // c) * (n + (1 << (c + 1)))
+        if best_cost is None or cost < best_cost:
+            best, best_cost = c, cost
+    return best
+
+
+def pippenger(terms, width=None):
+    '''Computes sum(scalar * point) for (scalar, jacobian) pairs by sorting
+    points into buckets per window (Pippenger); returns a Jacobian point'''
+    terms = [(scalar, point) for scalar, point in terms if point is not None and scalar]
+    if not terms:
+        return None
+    bits = max(scalar.bit_length() for scalar, _ in terms)
+    if width is None:
+        width = pippenger_window(len(terms), bits)
+    mask = (1 << width) - 1
+    result = None
+    for shift in reversed(range(0, bits, width)):
+        for _ in range(width):
+            result = jacobian_double(result)
+        buckets = [None] * (mask + 1)
+        for scalar, point in terms:
+            d = (scalar >> shift) & mask
+            if d:
+                buckets[d] = jacobian_add(buckets[d], point)
+        # sum(d * buckets[d]) with two running sums
+        running = None
+        window_sum = None
+        for d in range(mask, 0, -1):
+            running = jacobian_add(running, buckets[d])
+            window_sum = jacobian_add(window_sum, running)
+        result = jacobian_add(result, window_sum)
+    return result
+
+
+# batches with at least this many half-length terms (two per point after
+# glv_terms) go through pippenger instead of strauss
+PIPPENGER_THRESHOLD = 128
+
+
+def multi_mul(terms):
+    '''Returns sum(scalar * point) over a list of (scalar, S256Point) pairs.
+    Points with a fixed-base table, or hot enough to get one from
+    TABLE_CACHE, use it; the rest share their doublings in strauss, or in
+    pippenger once the batch is large'''
+    result = None
+    variable = []
+    for scalar, point in terms:
+        table = point.fixed_base or TABLE_CACHE.lookup(point)
+        if table is not None:
+            result = table.mul(scalar, result)
+            continue
+        variable += glv_terms(scalar % N, point.jacobian)
+    if len(variable) >= PIPPENGER_THRESHOLD:
+        result = jacobian_add(result, pippenger(variable))
+    else:
+        result = jacobian_add(result, strauss(variable))
+    return S256Point.from_jacobian(result)
+
+
+class Signature:
+
+    def __init__(self, r, s):
+        self.r = r
+        self.s = s
+
+    def __repr__(self):
+        return 'Signature({:x},{:x})'.format(self.r, self.s)
+
+    def der(self):
+        rbin = self.r.to_bytes(32, byteorder='big')
+        # remove all null bytes at the beginning
+        rbin = rbin.lstrip(b'\x00')
+        # if rbin has a high bit, add a \x00
+        if rbin[0] & 0x80:
+            rbin = b'\x00' + rbin
+        result = bytes([2, len(rbin)]) + rbin
+        sbin = self.s.to_bytes(32, byteorder='big')
+        # remove all null bytes at the beginning
+        sbin = sbin.lstrip(b'\x00')
+        # if sbin has a high bit, add a \x00
+        if sbin[0] & 0x80:
+            sbin = b'\x00' + sbin
+        result += bytes([2, len(sbin)]) + sbin
+        return bytes([0x30, len(result)]) + result
+
+    @classmethod
+    def parse(cls, signature_bin):
+        s = BytesIO(signature_bin)
+        compound = s.read(1)[0]
+        if compound != 0x30:
+            raise SyntaxError("Bad Signature")
+        length = s.read(1)[0]
+        if length + 2 != len(signature_bin):
+            raise SyntaxError("Bad Signature Length")
+        marker = s.read(1)[0]
+        if marker != 0x02:
+            raise SyntaxError("Bad Signature")
+        rlength = s.read(1)[0]
+        r = int.from_bytes(s.read(rlength), 'big')
+        marker = s.read(1)[0]
+        if marker != 0x02:
+            raise SyntaxError("Bad Signature")
+        slength = s.read(1)[0]
+        s = int.from_bytes(s.read(slength), 'big')
+        if len(signature_bin) != 6 + rlength + slength:
+            raise SyntaxError("Signature too long")
+        return cls(r, s)
+
+
+class PrivateKey:
+
+    def __init__(self, secret):
+        self.secret = secret
+        self.point = secret * G
+
+    def hex(self):
+        return '{:x}'.format(self.secret).zfill(64)
+
+    def sign(self, z):
+        k = self.deterministic_k(z)
+        # r is the x coordinate of the resulting point k*G
+        r = int((k * G).normalize()[0])
+        # remember 1/k = pow(k, N-2, N)
+        k_inv = pow(k, N - 2, N)
+        # s = (z+r*secret) / k
+        s = (z + r * self.secret) * k_inv % N
+        if s > N / 2:
+            s = N - s
+        # return an instance of Signature:
+        # Signature(r, s)
+        return Signature(r, s)
+
+    def deterministic_k(self, z):
+        k = b'\x00' * 32
+        v = b'\x01' * 32
+        if z > N:
+            z -= N
+        z_bytes = z.to_bytes(32, 'big')
+        secret_bytes = self.secret.to_bytes(32, 'big')
+        s256 = hashlib.sha256
+        k = hmac.new(k, v + b'\x00' + secret_bytes + z_bytes, s256).digest()
+        v = hmac.new(k, v, s256).digest()
+        k = hmac.new(k, v + b'\x01' + secret_bytes + z_bytes, s256).digest()
+        v = hmac.new(k, v, s256).digest()
+        while True:
+            v = hmac.new(k, v, s256).digest()
+            candidate = int.from_bytes(v, 'big')
+            if candidate >= 1 and candidate < N:
+                return candidate
+            k = hmac.new(k, v + b'\x00', s256).digest()
+            v = hmac.new(k, v, s256).digest()
+
+    def wif(self, compressed=True, testnet=False):
+        # convert the secret from integer to a 32-bytes in big endian using num.to_bytes(32, 'big')
+        secret_bytes = self.secret.to_bytes(32, 'big')
+        # prepend b'\xef' on testnet, b'\x80' on mainnet
+        if testnet:
+            prefix = b'\xef'
+        else:
+            prefix = b'\x80'
+        # append b'\x01' if compressed
+        if compressed:
+            suffix = b'\x01'
+        else:
+            suffix = b''
+        # encode_base58_checksum the whole thing
+        return encode_base58_checksum(prefix + secret_bytes + suffix)
\ No newline at end of file
@@ -1,9 +1,12 @@
+import atexit
 import os
 import re
 import socket
 
 from wallet import Wallet
-from chain import Chain, currentdir
+from chain import Chain
+from ring import H_P_CACHE
+from verifier import Verifier
 
 CHAIN_PORT = 6707
 CHAIN_NAME = 'ring'
@@ -25,11 +28,15 @@ def validate_port(ip, port=CHAIN_PORT):
 class Network:
     def __init__(self):
         self.wallet = Wallet.me()
+        # checks received chains and signs sent txs on every core
+        self.verifier = Verifier()
         # chain read from dat file
         self.chain = Chain(name=CHAIN_NAME)
         try:
-            self.chain.loadBlockData()
-        except:
+            # blocks are parsed as they are used, startup parses no block.
+            # A damaged log raises: a new genesis would overwrite it
+            self.chain.loadBlockData(mapped=True)
+        except FileNotFoundError:
             filePath = self.chain.getBlockDataFile()
             os.makedirs(os.path.dirname(filePath), exist_ok=True)
         try:
@@ -38,6 +45,10 @@ class Network:
             filePath = self.chain.getTxDataFile()
             os.makedirs(os.path.dirname(filePath), exist_ok=True)
         
+        # keep hash-to-point results of every output across restarts
+        H_P_CACHE.open(os.path.join(self.chain.getDataDir(), 'hp'))
+        atexit.register(self.close)
+
         if len(self.chain.blocks) == 0 and len(self.chain.txs) == 0:
             self.chain = Chain.genesis(name=CHAIN_NAME)
             self.chain.dumpBlockData()
@@ -45,11 +56,16 @@ class Network:
         self.loadNodes()
     
 
+    def close(self):
+        # stops the worker pool and writes out the H_p store
+        self.verifier.close()
+        H_P_CACHE.close()
+
     """
     methods managing node
     """
     def loadNodes(self):
-        nodes_path = os.path.join(currentdir, 'data', CHAIN_NAME, 'node.dat')
+        nodes_path = os.path.join(self.chain.getDataDir(), 'node.dat')
         try:
             nodes = []
             with open(nodes_path, 'r') as f:
@@ -65,7 +81,7 @@ class Network:
 
     # automated in register and discard
     def dumpNodes(self):
-        nodes_path = os.path.join(currentdir, 'data', CHAIN_NAME, 'node.dat')
+        nodes_path = os.path.join(self.chain.getDataDir(), 'node.dat')
         with open(nodes_path, 'w+') as f:
             for ip in self.nodes:
                 f.write(ip)
@@ -123,7 +139,8 @@ class Network:
             addr = address,
             chain = self.chain,
             amount = amount,
-            fee = fee
+            fee = fee,
+            verifier = self.verifier,
         )
 
     """
@@ -142,7 +159,7 @@ class Network:
     # s <- Bytes stream
     def replaceChainInBytes(self, s):
         blocks = Chain.parseBlocks(s)
-        self.chain.replace(blocks)
+        self.chain.replace(blocks, self.verifier)
     
     # automated in /connect
     # s <- Bytes stream
@@ -1,27 +1,152 @@
+import dbm
 import hashlib
 import random
+import threading
+
+from collections import OrderedDict
 
 from ecc import (
     PrivateKey as EccKey,
     S256Point as EccPubKey,
     G as EccGenerator,
     N as EccOrder,
+    multi_mul,
+    hash_to_curve,
+    normalize_batch,
 )
 
+class HashPointCache:
+    '''Memo of MLSAG.H_p keyed by the H_p version byte followed by the
+    compressed SEC of the input point.
+    Recent results stay in an LRU of the given size; once open() is called
+    every result is also written to a dbm file, so outputs seen before a
+    restart are not hashed to a point again.
+    Threads serving requests share it, so every access takes the lock;
+    dbm has no locking of its own.'''
+
+    def __init__(self, size):
+        self.size = size
+        self.lock = threading.Lock()
+        self.points = OrderedDict()
+        self.store = None
+        self.inherited = None
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.points)
+
+    def open(self, path):
+        self.close()
+        with self.lock:
+            self.store = dbm.open(path, 'c')
+
+    def close(self):
+        with self.lock:
+            if self.store is not None:
+                self.store.close()
+                self.store = None
+
+    def detach(self):
+        # for a forked worker: stops using the store opened by the parent.
+        # It is kept, not closed, as closing would commit this process's
+        # stale copy of the index; workers leave through os._exit. The
+        # lock is replaced, as another thread may have held it at the fork
+        self.lock = threading.Lock()
+        self.inherited = self.store
+        self.store = None
+
+    def get(self, key):
+        with self.lock:
+            point = self.points.get(key)
+            if point is not None:
+                self.hits += 1
+                self.points.move_to_end(key)
+                return point
+            if self.store is not None and key in self.store:
+                self.hits += 1
+                point = EccPubKey.parse(self.store[key])
+                self.remember(key, point)
+                return point
+            self.misses += 1
+            return None
+
+    def put(self, key, point):
+        with self.lock:
+            self.remember(key, point)
+            if self.store is not None:
+                # uncompressed, so loading it back needs no square root
+                self.store[key] = point.sec(compressed=False)
+
+    def remember(self, key, point):
+        # with the lock held
+        if self.size <= 0:
+            return
+        self.points[key] = point
+        self.points.move_to_end(key)
+        while len(self.points) > self.size:
+            self.points.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.points.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        with self.lock:
+            return {
+                'size': len(self.points),
+                'max_size': self.size,
+                'stored': 0 if self.store is None else len(self.store),
+                'hits': self.hits,
+                'misses': self.misses,
+            }
+
+
+# number of H_p results kept in memory
+H_P_CACHE_SIZE = 1 << 14
+H_P_CACHE = HashPointCache(H_P_CACHE_SIZE)
+
+
 class MLSAG:
 
-    def __init__(self, k):
+    # H_p versions, key images of the same output differ between them:
+    # H_P_SCALAR maps to hash(point) * G, whose discrete log is known, so
+    # anyone can link its key images; it stays for tx type 1 only.
+    # H_P_TRY lifts the hash to a curve point with hash_to_curve
+    H_P_SCALAR = 0
+    H_P_TRY = 1
+
+    def __init__(self, k, version=H_P_TRY):
         self.k = k
         self.n = len(k)
         self.m = len(k[0])
+        self.version = version
     
     @staticmethod
-    def H_p(point):
-        hashed_p = hashlib.sha256(point.sec())
-        return (int(hashed_p.hexdigest(), 16) % EccOrder) * EccGenerator
+    def H_p(point, version=H_P_TRY):
+        # every ring member is hashed on each sign and verify, and key
+        # images hash the same outputs again, so results are memoized
+        key = bytes([version]) + point.sec()
+        result = H_P_CACHE.get(key)
+        if result is None:
+            if version == MLSAG.H_P_TRY:
+                result = hash_to_curve(point.sec())
+            elif version == MLSAG.H_P_SCALAR:
+                hashed_p = hashlib.sha256(point.sec())
+                result = (int(hashed_p.hexdigest(), 16) % EccOrder) * EccGenerator
+                # made affine once, so it can get a table when hot
+                normalize_batch([result])
+            else:
+                raise ValueError('Unknown H_p version {}'.format(version))
+            H_P_CACHE.put(key, result)
+        return result
 
     @staticmethod
     def H(l):
+        # one inversion for every L/R point instead of one each
+        normalize_batch([item for item in l if isinstance(item, EccPubKey)])
         h = hashlib.sha256()
         for item in l:
             if isinstance(item, str):
@@ -41,7 +166,7 @@ class MLSAG:
             raise TypeError("wrong private key array size")
         I = [None] * self.m
         for j in range(self.m):
-            I[j] = sk[j] * self.H_p(self.k[z][j])
+            I[j] = sk[j] * self.H_p(self.k[z][j], self.version)
         s = [ [ None for j in range(self.m) ] for i in range(self.n) ]
         L = [ [ None for j in range(self.m) ] for i in range(self.n) ]
         R = [ [ None for j in range(self.m) ] for i in range(self.n) ]
@@ -55,7 +180,7 @@ class MLSAG:
 
         for j in range(self.m):
             L[z][j] = _alpha[j] * EccGenerator
-            R[z][j] = _alpha[j] * self.H_p(self.k[z][j])
+            R[z][j] = _alpha[j] * self.H_p(self.k[z][j], self.version)
             
         hashin = [m]
         for j in range(self.m):
@@ -70,8 +195,8 @@ class MLSAG:
         for i in whole_range:
             hashin = [m]
             for j in range(self.m):
-                L[i][j] = s[i][j] * EccGenerator + c[i] * self.k[i][j]
-                R[i][j] = s[i][j] * self.H_p(self.k[i][j]) + c[i] * I[j]
+                L[i][j] = multi_mul([(s[i][j], EccGenerator), (c[i], self.k[i][j])])
+                R[i][j] = multi_mul([(s[i][j], self.H_p(self.k[i][j], self.version)), (c[i], I[j])])
                 hashin.append(L[i][j])
                 hashin.append(R[i][j])
             c[(i+1) % self.n] = self.H(hashin)
@@ -94,10 +219,86 @@ class MLSAG:
         for i in range(self.n):
             hashin = [m]
             for j in range(self.m):
-                L[i][j] = s[i][j] * EccGenerator + c[i] * self.k[i][j]
-                R[i][j] = s[i][j] * self.H_p(self.k[i][j]) + c[i] * I[j]
+                L[i][j] = multi_mul([(s[i][j], EccGenerator), (c[i], self.k[i][j])])
+                R[i][j] = multi_mul([(s[i][j], self.H_p(self.k[i][j], self.version)), (c[i], I[j])])
                 hashin.append(L[i][j])
                 hashin.append(R[i][j])
             c[i+1] = self.H(hashin)
 
-        return c[0] == c[self.n]
\ No newline at end of file
+        return c[0] == c[self.n]
+
+
+class CLSAG:
+    """
+    Concise linkable ring signature (CLSAG) over a ring of [P, C] pairs,
+    where P is a one-time address and C a commitment to zero.
+
+    The signer knows p with P = p*G and x with C = x*G for one member.
+    Both are proven with a single aggregated key W = mu_P*P + mu_C*C, so
+    the signature is [I, D, c0] + s with one s per member:
+        I = p * H_p(P) is the key image, as in MLSAG;
+        D = x * H_p(P) only links the commitment column.
+    """
+
+    def __init__(self, k, version=MLSAG.H_P_TRY):
+        self.k = k
+        self.n = len(k)
+        self.version = version
+
+    def aggregate(self, I, D):
+        # mu_P and mu_C bind the whole ring and both images
+        ring = [point for member in self.k for point in member]
+        mu_P = MLSAG.H(["CLSAG_agg_0"] + ring + [I, D]) % EccOrder
+        mu_C = MLSAG.H(["CLSAG_agg_1"] + ring + [I, D]) % EccOrder
+        return mu_P, mu_C
+
+    def challenge(self, m, L, R):
+        ring = [point for member in self.k for point in member]
+        return MLSAG.H(["CLSAG_round"] + ring + [m, L, R]) % EccOrder
+
+    def sign(self, m, z, sk):
+        # sk = [p, x] for the member at index z
+        if len(sk) != 2:
+            raise TypeError("wrong private key array size")
+        H_z = MLSAG.H_p(self.k[z][0], self.version)
+        I = sk[0] * H_z
+        D = sk[1] * H_z
+        mu_P, mu_C = self.aggregate(I, D)
+        W_I = multi_mul([(mu_P, I), (mu_C, D)])
+
+        s = [random.randint(0, EccOrder) for i in range(self.n)]
+        c = [None] * self.n
+        _alpha = random.randint(0, EccOrder)
+        c[(z+1) % self.n] = self.challenge(m, _alpha * EccGenerator, _alpha * H_z)
+
+        first_range = list(range(z + 1, self.n))
+        second_range = list(range(z))
+        whole_range = first_range + second_range
+
+        for i in whole_range:
+            P, C = self.k[i]
+            L = multi_mul([(s[i], EccGenerator), (c[i] * mu_P, P), (c[i] * mu_C, C)])
+            R = multi_mul([(s[i], MLSAG.H_p(P, self.version)), (c[i], W_I)])
+            c[(i+1) % self.n] = self.challenge(m, L, R)
+
+        s[z] = (_alpha - c[z] * (mu_P * sk[0] + mu_C * sk[1])) % EccOrder
+
+        return [I, D, c[0]] + s
+
+    def verify(self, m, sig):
+        I, D, c0 = sig[0:3]
+        s = sig[3:]
+        if len(s) != self.n:
+            return False
+        mu_P, mu_C = self.aggregate(I, D)
+        W_I = multi_mul([(mu_P, I), (mu_C, D)])
+
+        c = c0
+        for i in range(self.n):
+            P, C = self.k[i]
+            # one aggregated key per member instead of one per column
+            L = multi_mul([(s[i], EccGenerator), (c * mu_P, P), (c * mu_C, C)])
+            R = multi_mul([(s[i], MLSAG.H_p(P, self.version)), (c, W_I)])
+            c = self.challenge(m, L, R)
+
+        return c == c0
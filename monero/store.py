@@ -0,0 +1,284 @@
+import mmap
+import os
+import sys
+import zlib
+
+from array import array
+from collections import OrderedDict
+from helper import (
+    little_endian_to_int,
+    int_to_little_endian,
+)
+
+
+# number of parsed blocks kept by a MappedBlocks
+BLOCK_CACHE_SIZE = 256
+
+
+class BlockStore:
+    """
+    Append-only log of serialized blocks
+
+    The log starts with MAGIC, then holds one record per block:
+        4 bytes: length of the block, little endian
+        4 bytes: crc32 of the block, little endian
+        the serialized block
+    A side file (path + '.idx') holds the 8-byte offset of every record,
+    so a block is read without scanning the ones before it. Appending a
+    block writes only that block; the log is cut back only on a reorg, and
+    rewritten whole only through a new file moved over it.
+    With sync, each append is fsynced before it returns.
+    """
+
+    MAGIC = b'ringlog\x01'
+
+    def __init__(self, path, sync=True):
+        self.path = path
+        self.indexPath = path + '.idx'
+        self.sync = sync
+
+    def exists(self):
+        return os.path.exists(self.path)
+
+    def isLog(self):
+        # False for a file at path in another format
+        with open(self.path, 'rb') as f:
+            return f.read(len(self.MAGIC)) == self.MAGIC
+
+    def __len__(self):
+        if not os.path.exists(self.indexPath):
+            return 0
+        return os.path.getsize(self.indexPath) // 8
+
+    def write(self, f, data):
+        f.write(data)
+        if self.sync:
+            f.flush()
+            os.fsync(f.fileno())
+
+    def create(self):
+        # an empty log, replacing any file at path
+        with open(self.path, 'wb') as f:
+            self.write(f, self.MAGIC)
+        with open(self.indexPath, 'wb') as f:
+            self.write(f, b'')
+
+    def offset(self, height):
+        with open(self.indexPath, 'rb') as f:
+            f.seek(height * 8)
+            return little_endian_to_int(f.read(8))
+
+    @staticmethod
+    def record(data):
+        return int_to_little_endian(len(data), 4) + \
+            int_to_little_endian(zlib.crc32(data), 4) + data
+
+    def append(self, data):
+        # returns the height of the new record
+        if not self.exists():
+            self.create()
+        with open(self.path, 'ab') as f:
+            offset = f.tell()
+            self.write(f, self.record(data))
+        with open(self.indexPath, 'ab') as f:
+            self.write(f, int_to_little_endian(offset, 8))
+        return len(self) - 1
+
+    def rewrite(self, blocks):
+        # replaces the log with one holding blocks. The new log and index
+        # are written next to the old ones and moved over them, so a crash
+        # leaves one log or the other whole. The old index is removed
+        # first: a log found without one gets its index rebuilt
+        temp = BlockStore(self.path + '.tmp', self.sync)
+        try:
+            offsets = []
+            with open(temp.path, 'wb') as f:
+                f.write(self.MAGIC)
+                for data in blocks:
+                    offsets.append(f.tell())
+                    f.write(self.record(data))
+                self.write(f, b'')
+            with open(temp.indexPath, 'wb') as f:
+                self.write(f, b''.join(int_to_little_endian(o, 8) for o in offsets))
+        except BaseException:
+            for path in (temp.path, temp.indexPath):
+                if os.path.exists(path):
+                    os.remove(path)
+            raise
+        if os.path.exists(self.indexPath):
+            os.remove(self.indexPath)
+        os.replace(temp.path, self.path)
+        os.replace(temp.indexPath, self.indexPath)
+
+    def truncate(self, height):
+        # drops the records from height on
+        if height >= len(self):
+            return
+        offset = self.offset(height)
+        with open(self.path, 'r+b') as f:
+            f.truncate(offset)
+        with open(self.indexPath, 'r+b') as f:
+            f.truncate(height * 8)
+
+    def read(self, height):
+        if height < 0 or height >= len(self):
+            raise IndexError('no block at height {}'.format(height))
+        with open(self.path, 'rb') as f:
+            f.seek(self.offset(height))
+            return self.readRecord(f)
+
+    @staticmethod
+    def readRecord(f):
+        # the block of the record at the position of f, or None if the
+        # record is cut short by the end of the file. A whole record that
+        # fails its checksum was damaged after it was written: ValueError
+        offset = f.tell()
+        header = f.read(8)
+        if len(header) < 8:
+            return None
+        length = little_endian_to_int(header[:4])
+        data = f.read(length)
+        if len(data) < length:
+            return None
+        if zlib.crc32(data) != little_endian_to_int(header[4:]):
+            raise ValueError('record at offset {} fails its checksum'.format(offset))
+        return data
+
+    def offsets(self):
+        # the offsets of every record, read from the index. Only the last
+        # record is checked; if the log does not end with it, records()
+        # repairs the log
+        if not self.exists():
+            raise FileNotFoundError(self.path)
+        offsets = array('Q')
+        if os.path.exists(self.indexPath):
+            with open(self.indexPath, 'rb') as f:
+                index = f.read()
+            offsets.frombytes(index[:len(index) - len(index) % 8])
+            if sys.byteorder == 'big':
+                offsets.byteswap()
+        size = os.path.getsize(self.path)
+        with open(self.path, 'rb') as f:
+            if f.read(len(self.MAGIC)) != self.MAGIC:
+                raise ValueError('{} is not a block log'.format(self.path))
+            if offsets:
+                f.seek(offsets[-1])
+                whole = self.readRecord(f) is not None and f.tell() == size
+            else:
+                whole = size == len(self.MAGIC)
+        if not whole:
+            self.records()
+            return self.offsets()
+        return offsets
+
+    def records(self):
+        # returns every block in order. A write interrupted by a crash
+        # leaves a last record running past the end of the file: the log
+        # is cut back to the record before it. A damaged record anywhere
+        # raises ValueError and leaves the files as they are. The index is
+        # rebuilt if it disagrees with the log
+        if not self.exists():
+            raise FileNotFoundError(self.path)
+        blocks = []
+        offsets = []
+        with open(self.path, 'rb') as f:
+            if f.read(len(self.MAGIC)) != self.MAGIC:
+                raise ValueError('{} is not a block log'.format(self.path))
+            while True:
+                offset = f.tell()
+                data = self.readRecord(f)
+                if data is None:
+                    break
+                blocks.append(data)
+                offsets.append(offset)
+        if offset != os.path.getsize(self.path):
+            with open(self.path, 'r+b') as f:
+                f.truncate(offset)
+        index = b''.join(int_to_little_endian(o, 8) for o in offsets)
+        if not os.path.exists(self.indexPath) or len(self) != len(offsets) or \
+                (offsets and self.offset(len(offsets) - 1) != offsets[-1]):
+            with open(self.indexPath, 'wb') as f:
+                self.write(f, index)
+        return blocks
+
+
+class MappedBlocks:
+    """
+    The blocks of a BlockStore as a list that parses them on access
+
+    The log is memory-mapped and only the record offsets are kept in
+    memory. Every record is checked against its crc32 once, when the map
+    is made, so a damaged block fails the load rather than a later access.
+    The last size blocks parsed are kept, least recently used first out. Blocks appended after the map was made are kept as given.
+    The map must be closed before the log is truncated or rewritten.
+    """
+
+    def __init__(self, store, parse, size=BLOCK_CACHE_SIZE):
+        # parse: turns the bytes of a record into a block
+        self.offsets = store.offsets()
+        self.parse = parse
+        self.size = size
+        self.blocks = OrderedDict()
+        self.appended = []
+        with open(store.path, 'rb') as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            for i in range(len(self.offsets)):
+                self.record(i)
+        except ValueError:
+            self.map.close()
+            raise
+
+    def __len__(self):
+        return len(self.offsets) + len(self.appended)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if i < 0 or i >= len(self):
+            raise IndexError('block index out of range')
+        if i >= len(self.offsets):
+            return self.appended[i - len(self.offsets)]
+        block = self.blocks.get(i)
+        if block is not None:
+            self.blocks.move_to_end(i)
+            return block
+        block = self.parse(self.record(i))
+        if self.size > 0:
+            self.blocks[i] = block
+            while len(self.blocks) > self.size:
+                self.blocks.popitem(last=False)
+        return block
+
+    def scan(self, start=0, stop=None):
+        # the blocks from start to stop, for a single pass over many of
+        # them: blocks not in the cache are parsed without being kept
+        stop = len(self) if stop is None else min(stop, len(self))
+        for i in range(start, stop):
+            if i < len(self.offsets) and i not in self.blocks:
+                yield self.parse(self.record(i))
+            else:
+                yield self[i]
+
+    def record(self, i):
+        # the serialized block at height i, read from the map
+        offset = self.offsets[i]
+        length = little_endian_to_int(self.map[offset:offset + 4])
+        checksum = little_endian_to_int(self.map[offset + 4:offset + 8])
+        data = self.map[offset + 8:offset + 8 + length]
+        if zlib.crc32(data) != checksum:
+            raise ValueError('block {} fails its checksum'.format(i))
+        return data
+
+    def append(self, block):
+        self.appended.append(block)
+
+    def close(self):
+        self.blocks.clear()
+        self.map.close()
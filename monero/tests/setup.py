@@ -1,7 +1,18 @@
 import os
 import sys
 import inspect
+import atexit
+import shutil
+import tempfile
 
 currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
 parentdir = os.path.dirname(currentdir)
-sys.path.insert(0, parentdir)
\ No newline at end of file
+sys.path.insert(0, parentdir)
+
+# chains and wallet keys written by the tests go to a temporary directory,
+# not to the ones of the node
+tempdir = tempfile.mkdtemp()
+atexit.register(shutil.rmtree, tempdir, True)
+os.environ['RING_DATA'] = os.path.join(tempdir, 'data')
+os.environ['RING_SECRET'] = os.path.join(tempdir, 'secret')
+os.makedirs(os.path.join(tempdir, 'data', 'ring'))
@@ -1,12 +1,22 @@
 import setup
+import os
+import tempfile
 import tx
 
 from io import BytesIO
 from unittest import TestCase
 from block import Block
+from verifier import Verifier
+from ring import H_P_CACHE
 from tx import *
 from address import UserKeys
 
+def hasHashPointStore(_):
+    # runs in a Verifier worker
+    import ring
+    return ring.H_P_CACHE.store is not None
+
+
 class BlockTest(TestCase):
 
     def test_emptyBlock(self):
@@ -86,6 +96,38 @@ class BlockTest(TestCase):
         parsed = Block.parse(BytesIO(serialized))
         self.assertTrue(block == parsed)
 
+        # the same checks on a pool of workers
+        verifier = Verifier(workers=2)
+        # workers never write the H_p store opened by the parent
+        with tempfile.TemporaryDirectory() as tmp:
+            H_P_CACHE.open(os.path.join(tmp, 'hp'))
+            executor = verifier.pool([1, 2])
+            self.assertEqual(list(executor.map(hasHashPointStore, [1, 2])), [False, False])
+            H_P_CACHE.close()
+        self.assertTrue(block.verify(verifier))
+        self.assertTrue(tx2.verify(verifier))
+        tx2.tx_ins[1].sig[2] += 1
+        self.assertEqual(verifier.verify(tx2.ringJobs()), [True, False])
+        self.assertFalse(block.verify(verifier))
+        self.assertFalse(block.verify())
+
+        # and signing on it
+        for type in [1, 3]:
+            tx3 = Tx.generate(
+                user = user,
+                oneTimeAddresses=oneTimeAddresses[3:6],
+                outs = [
+                    (receiver, 250),
+                    (receiver, 40),
+                ],
+                type = type,
+                verifier = verifier,
+            )
+            self.assertEqual(tx3.fee, 10)
+            self.assertTrue(tx3.verify())
+            self.assertTrue(Tx.parse(BytesIO(tx3.serialize())).verify())
+        verifier.close()
+
 
     def test_doubleSpend(self):
         prev_block = '0' * 32
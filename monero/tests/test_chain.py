@@ -15,6 +15,55 @@ class ChainTest(TestCase):
         chain.loadBlockData()
         for i in range(len(chain.blocks)):
             self.assertTrue(b[i] == chain.blocks[i])
+
+        # a chain.dat from serializeBlocks is moved to the block log
+        with open(chain.getBlockDataFile(), 'wb') as f:
+            f.write(chain.serializeBlocks())
+        chain.loadBlockData()
+        self.assertTrue(chain.blocks == b)
+        self.assertEqual(len(chain.getBlockStore()), 10)
+
+        # mining appends a single record
+        size = os.path.getsize(chain.getBlockDataFile())
+        chain.mine(UserKeys.generate().getPubKey())
+        block = chain.blocks[-1].serialize()
+        self.assertEqual(os.path.getsize(chain.getBlockDataFile()), size + 8 + len(block))
+        self.assertEqual(chain.getBlockStore().read(10), block)
+
+        # mapped blocks are parsed on use and keep working after mining
+        chain.loadBlockData(mapped=True)
+        self.assertEqual(len(chain.blocks.blocks), 0)
+        self.assertTrue(chain.blocks[10].serialize() == block)
+        self.assertTrue(chain.verifyBlocks())
+        chain.mine(UserKeys.generate().getPubKey())
+        self.assertEqual(len(chain.getBlockStore()), 12)
+        out = chain.blocks[-1].miner.tx_outs[0]
+        self.assertEqual(chain.findOutput(out.oneTimeAddr), (11, 0, 0, out))
+        # indexing keeps no parsed block, a lookup parses the one it needs
+        chain.loadBlockData(mapped=True)
+        self.assertTrue(chain.findOutput(out.oneTimeAddr)[3] == out)
+        self.assertEqual(list(chain.blocks.blocks), [11])
+        self.assertEqual(chain.outputs[out.oneTimeAddr.sec()], (11, 0, 0))
+        chain.dumpBlockData()
+        self.assertIsInstance(chain.blocks, list)
+        chain.loadBlockData()
+        self.assertTrue(chain.blocks[-1].miner.tx_outs[0] == out)
+
+        # a damaged log is reported, not taken for a chain.dat to convert
+        path = chain.getBlockDataFile()
+        with open(path, 'r+b') as f:
+            f.seek(chain.getBlockStore().offset(5) + 8)
+            byte = f.read(1)[0]
+            f.seek(-1, 1)
+            f.write(bytes([byte ^ 0xff]))
+        with open(path, 'rb') as f:
+            data = f.read()
+        with self.assertRaises(ValueError):
+            chain.loadBlockData()
+        with self.assertRaises(ValueError):
+            chain.loadBlockData(mapped=True)
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), data)
         
     def test_mining(self):
         chain = Chain.genesis('ring')
@@ -129,4 +178,130 @@ class ChainTest(TestCase):
         self.assertTrue(len(chain.blocks) == 10)
         chain.replace(Chain.parseBlocks(BytesIO(serialized_blocks)))
         self.assertTrue(len(chain.blocks) == 13)
-        self.assertTrue(chain.blocks[-1].miner.tx_outs[0].amount == 130)
\ No newline at end of file
+        self.assertTrue(chain.blocks[-1].miner.tx_outs[0].amount == 130)
+        # outputs are indexed by replace, mine and loadBlockData
+        block = chain.blocks[-1]
+        for position, t in enumerate([block.miner] + block.txs):
+            out = t.tx_outs[0]
+            self.assertEqual(chain.findOutput(out.oneTimeAddr), (12, position, 0, out))
+        self.assertIsNone(chain.findOutput(bob.getPubKey()[0]))
+        chain.mine(bob.getPubKey())
+        out = chain.blocks[-1].miner.tx_outs[0]
+        self.assertEqual(chain.findOutput(out.oneTimeAddr), (13, 0, 0, out))
+        chain.loadBlockData()
+        self.assertEqual(chain.searchOneTimeAddr(out.oneTimeAddr), out)
+        self.assertEqual(len(chain.outputs), sum(len(t.tx_outs) for b in chain.blocks for t in [b.miner] + b.txs))
+
+    def test_keyImages(self):
+        chain = Chain.genesis('ring')
+        # not the txs list shared by default with other chains
+        chain.txs = []
+        alice = UserKeys.generate()
+        chain.mine(pubKeyPair=alice.getPubKey())
+        chain.mine(pubKeyPair=alice.getPubKey())
+
+        tx.searchOneTimeAddr = chain.searchOneTimeAddr
+        tx.searchOneTimeAddrIndex = chain.searchOneTimeAddrIndex
+        tx.selectOneTimeAddr = chain.selectOneTimeAddr
+
+        t = Tx.generate(
+            user = alice,
+            oneTimeAddresses=[
+                chain.blocks[-1].miner.tx_outs[0].oneTimeAddr,
+            ],
+            outs = [
+                (alice.getPubKey(), 90)
+            ]
+        )
+        # a longer fork without the tx
+        fork = Chain(name='ring', blocks=chain.blocks[:12], txs=[])
+        fork.mine(alice.getPubKey())
+        fork.mine(alice.getPubKey())
+
+        chain.add_tx(t)
+        chain.mine(alice.getPubKey())
+        # the reorg below also truncates a mapped block log
+        chain.dumpBlockData()
+        chain.loadBlockData(mapped=True)
+        keyImage = t.tx_ins[0].keyImage
+        self.assertTrue(chain.isSpent(keyImage))
+        self.assertEqual(len(chain.keyImages), 1)
+        with self.assertRaises(RuntimeError):
+            chain.add_tx(t)
+
+        # rolls the spend back
+        dropped = chain.blocks[-1]
+        chain.replace(fork.blocks)
+        self.assertEqual(len(chain.blocks), 14)
+        self.assertIsInstance(chain.blocks, list)
+        self.assertEqual(len(chain.getBlockStore()), 14)
+        self.assertFalse(chain.isSpent(keyImage))
+        self.assertEqual(len(chain.keyImages), 0)
+        self.assertIsNone(chain.findOutput(dropped.miner.tx_outs[0].oneTimeAddr))
+        self.assertIsNotNone(chain.findOutput(fork.blocks[-1].miner.tx_outs[0].oneTimeAddr))
+        self.assertIsNotNone(chain.findOutput(fork.blocks[11].miner.tx_outs[0].oneTimeAddr))
+        chain.add_tx(t)
+        self.assertTrue(chain.verifyTxs())
+
+        # blocks popped from the list directly are dropped from the index
+        # on the next lookup, and the blocks left stay indexed
+        chain.mine(alice.getPubKey())
+        self.assertTrue(chain.isSpent(keyImage))
+        spent = chain.blocks[11].miner.tx_outs[0].oneTimeAddr
+        last = chain.blocks[-1].miner.tx_outs[0].oneTimeAddr
+        chain.blocks.pop()
+        self.assertEqual(chain.findOutput(spent)[0], 11)
+        self.assertFalse(chain.isSpent(keyImage))
+        self.assertIsNone(chain.findOutput(last))
+        self.assertEqual(chain.indexed, 14)
+
+    def test_ringVersions(self):
+        chain = Chain.genesis('ring')
+        chain.txs = []
+        alice = UserKeys.generate()
+        chain.mine(pubKeyPair=alice.getPubKey())
+        chain.mine(pubKeyPair=alice.getPubKey())
+        self.assertEqual(chain.ringVersion, tx.currentRingVersion())
+
+        tx.searchOneTimeAddr = chain.searchOneTimeAddr
+        tx.searchOneTimeAddrIndex = chain.searchOneTimeAddrIndex
+        tx.selectOneTimeAddr = chain.selectOneTimeAddr
+
+        oneTimeAddr = chain.blocks[-1].miner.tx_outs[0].oneTimeAddr
+        def spend(type):
+            return Tx.generate(
+                user = alice,
+                oneTimeAddresses=[oneTimeAddr],
+                outs = [(alice.getPubKey(), 90)],
+                type = type,
+            )
+        chain.add_tx(spend(1))
+        chain.mine(alice.getPubKey())
+
+        # the same output under other H_p versions has another key image
+        for type in (2, 3):
+            t = spend(type)
+            self.assertTrue(t.verify())
+            self.assertFalse(chain.isSpent(t.tx_ins[0].keyImage))
+            with self.assertRaises(RuntimeError):
+                chain.add_tx(t)
+            chain.replace_tx([t])
+            self.assertEqual(chain.txs, [])
+            block = Block(prev=chain.blocks[-1].hash(), txs=[t])
+            block.createMiner(alice.getPubKey())
+            block.pow()
+            self.assertTrue(block.verify())
+            self.assertFalse(block.verify(ringVersion=chain.ringVersion))
+            other = Chain(name='ring', blocks=chain.blocks + [block], txs=[])
+            self.assertFalse(other.verifyBlocks())
+
+        # types 2 and 3 share a version, and so their key images
+        chain = Chain(name='ring', blocks=chain.blocks[:12], txs=[],
+            ringVersion=tx.RING_VERSIONS[2][1])
+        self.assertTrue(chain.verifyBlocks())
+        with self.assertRaises(RuntimeError):
+            chain.add_tx(spend(1))
+        chain.add_tx(spend(2))
+        chain.mine(alice.getPubKey())
+        with self.assertRaises(RuntimeError):
+            chain.add_tx(spend(3))
@@ -0,0 +1,308 @@
+import setup
+import sys
+import threading
+from random import randint
+from unittest import TestCase, mock
+
+import curve
+
+# internals of the optimized engine, whichever backend is selected
+ecc = curve.load_backend('optimized')
+
+
+def run_threads(work, count=4):
+    '''runs work(i) on count threads switching as often as possible,
+    returns the exceptions they raised'''
+    errors = []
+    def run(i):
+        try:
+            work(i)
+        except Exception as e:
+            errors.append(e)
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        threads = [threading.Thread(target=run, args=(i,)) for i in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(interval)
+    return errors
+
+
+class BackendTest(TestCase):
+    '''checks every loadable backend against the reference on random inputs'''
+
+    ROUNDS = 5
+
+    def setUp(self):
+        self.reference = curve.load_backend('reference')
+        self.backends = []
+        for name in curve.BACKENDS:
+            if name == 'reference':
+                continue
+            try:
+                self.backends.append(curve.load_backend(name))
+            except ImportError:
+                pass
+
+    def random_point(self, ref):
+        return randint(1, ref.N - 1) * ref.G
+
+    def test_selected(self):
+        self.assertIn(curve.BACKEND, curve.BACKENDS)
+        self.assertIs(curve.S256Point, curve.backend.S256Point)
+        with self.assertRaises(ValueError):
+            curve.load_backend('unknown')
+
+    def test_mul(self):
+        ref = self.reference
+        for _ in range(self.ROUNDS):
+            k = randint(0, ref.N - 1)
+            point = self.random_point(ref)
+            expected = [(k * ref.G).sec(), (k * point).sec(False)]
+            for backend in self.backends:
+                other = backend.S256Point.parse(point.sec())
+                actual = [(k * backend.G).sec(), (k * other).sec(False)]
+                self.assertEqual(actual, expected, backend.__name__)
+
+    def test_add(self):
+        ref = self.reference
+        for _ in range(self.ROUNDS):
+            p, q = self.random_point(ref), self.random_point(ref)
+            expected = [(p + q).sec(), (p - q).sec(), (p + p).sec()]
+            for backend in self.backends:
+                p2 = backend.S256Point.parse(p.sec())
+                q2 = backend.S256Point.parse(q.sec(False))
+                actual = [(p2 + q2).sec(), (p2 - q2).sec(), (p2 + p2).sec()]
+                self.assertEqual(actual, expected, backend.__name__)
+                self.assertIsNone((p2 - p2).x)
+
+    def test_multi_mul(self):
+        ref = self.reference
+        scalars = [randint(-ref.N, ref.N) for _ in range(6)]
+        points = [ref.G] + [self.random_point(ref) for _ in range(5)]
+        expected = ref.multi_mul(list(zip(scalars, points))).sec()
+        for backend in self.backends:
+            others = [backend.G] + [backend.S256Point.parse(p.sec()) for p in points[1:]]
+            actual = backend.multi_mul(list(zip(scalars, others))).sec()
+            self.assertEqual(actual, expected, backend.__name__)
+
+    def test_sign_verify(self):
+        ref = self.reference
+        for _ in range(self.ROUNDS):
+            secret, z = randint(1, ref.N - 1), randint(0, 2**256 - 1)
+            key = ref.PrivateKey(secret)
+            sig = key.sign(z)
+            for backend in self.backends:
+                other = backend.PrivateKey(secret)
+                self.assertEqual(other.point.sec(), key.point.sec())
+                self.assertEqual(other.sign(z).der(), sig.der())
+                self.assertTrue(other.point.verify(z, backend.Signature(sig.r, sig.s)))
+                self.assertFalse(other.point.verify(z, backend.Signature(sig.r, sig.s * 2 % ref.N)))
+
+
+class BenchTest(TestCase):
+
+    def test_run(self):
+        from curve import bench
+        cache = curve.load_backend('optimized').PARSE_CACHE
+        size = cache.size
+        results = bench.run('optimized', names=['field_mul', 'parse'], min_time=0.001)
+        self.assertEqual(results['backend'], 'optimized')
+        self.assertEqual(sorted(results['benchmarks']), ['field_mul', 'parse'])
+        self.assertEqual(cache.size, size)
+        ops = results['benchmarks']['parse']['ops_per_sec']
+        baseline = {'benchmarks': {
+            'field_mul': results['benchmarks']['field_mul'],
+            'parse': {'ops_per_sec': ops * 2},
+        }}
+        regressions = bench.compare(results, baseline, tolerance=10)
+        self.assertEqual([name for name, _, _ in regressions], ['parse'])
+        self.assertEqual(bench.compare(results, baseline, tolerance=60), [])
+
+
+class OptimizedTest(TestCase):
+
+    def test_trusted(self):
+        # trusted skips the curve check, the constructor keeps it
+        point = ecc.Point.trusted(x=-2, y=4, a=5, b=7)
+        self.assertEqual(point.x, -2)
+        with self.assertRaises(ValueError):
+            ecc.Point(x=-2, y=4, a=5, b=7)
+        a = ecc.Point(x=3, y=7, a=5, b=7)
+        self.assertEqual(type(a + a), ecc.Point)
+
+    def test_fixed_base(self):
+        # a copy of G has no table and takes the generic path
+        plain = ecc.S256Point(ecc.G.x.num, ecc.G.y.num)
+        self.assertIsNone(plain.fixed_base)
+        for secret in (0, 1, 15, 16, ecc.N - 1, ecc.N, randint(0, 2**256)):
+            self.assertEqual(secret * ecc.G, secret * plain)
+        # two tables sharing one accumulator, as for Pedersen commitments
+        h = randint(1, ecc.N - 1) * ecc.G
+        self.assertIs(h.precompute(), h)
+        self.assertIsNotNone(h.fixed_base)
+        y, b = randint(0, ecc.N - 1), randint(0, 2**64)
+        expected = y * plain + b * ecc.S256Point.parse(h.sec())
+        self.assertEqual(ecc.multi_mul([(y, ecc.G), (b, h)]), expected)
+
+    def test_pippenger(self):
+        terms = [(randint(0, ecc.N - 1), randint(1, ecc.N - 1) * ecc.G) for _ in range(20)]
+        terms += [(1, terms[0][1]), (-1, terms[1][1])]
+        expected = ecc.multi_mul(terms)
+        jacobians = [(scalar % ecc.N, point.jacobian) for scalar, point in terms]
+        for width in (1, 3, 8):
+            result = ecc.S256Point.from_jacobian(ecc.pippenger(jacobians, width=width))
+            self.assertEqual(result, expected)
+        self.assertEqual(ecc.S256Point.from_jacobian(ecc.pippenger(jacobians)), expected)
+
+    def test_glv(self):
+        point = ecc.LAMBDA * ecc.G
+        self.assertEqual(point.x.num, ecc.BETA * ecc.G.x.num % ecc.P)
+        self.assertEqual(point.y, ecc.G.y)
+        for k in (0, 1, ecc.N - 1, randint(0, ecc.N - 1), randint(0, ecc.N - 1)):
+            k1, k2 = ecc.glv_split(k)
+            self.assertEqual((k1 + k2 * ecc.LAMBDA) % ecc.N, k)
+            self.assertLessEqual(abs(k1).bit_length(), 129)
+            self.assertLessEqual(abs(k2).bit_length(), 129)
+        plain = ecc.S256Point(ecc.G.x.num, ecc.G.y.num)
+        for k in (2, ecc.N - 1, randint(0, ecc.N - 1)):
+            self.assertEqual(k * plain, k * ecc.G)
+
+    def test_wnaf(self):
+        for k in (1, 7, 2**128 - 1, randint(0, ecc.N - 1)):
+            for width in (2, 4, 5):
+                digits = ecc.wnaf(k, width)
+                self.assertEqual(sum(d << i for i, d in enumerate(digits)), k)
+                for i, d in enumerate(digits):
+                    if d:
+                        self.assertEqual(d % 2, 1)
+                        self.assertLess(abs(d), 1 << (width - 1))
+                        # at most one nonzero digit in any width window
+                        self.assertFalse(any(digits[i + 1:i + width]))
+        terms = [(randint(0, ecc.N - 1), (randint(1, ecc.N - 1) * ecc.G).jacobian) for _ in range(3)]
+        expected = ecc.S256Point.from_jacobian(ecc.pippenger(terms))
+        for width in (2, 5, 6):
+            self.assertEqual(ecc.S256Point.from_jacobian(ecc.strauss(terms, width)), expected)
+
+    def test_normalize_batch(self):
+        secrets = [randint(1, ecc.N - 1) for _ in range(5)]
+        points = [s * ecc.G + ecc.G for s in secrets] + [ecc.G - ecc.G, ecc.G]
+        self.assertFalse(points[0].is_normalized())
+        ecc.normalize_batch(points)
+        for point in points:
+            self.assertTrue(point.is_normalized())
+        for s, point in zip(secrets, points):
+            expected = (s + 1) * ecc.G
+            self.assertEqual(point.x.num, expected.x.num)
+            self.assertEqual(point.y.num, expected.y.num)
+        self.assertIsNone(points[-2].x)
+
+    def test_slots(self):
+        point = 5 * ecc.G
+        self.assertFalse(hasattr(point, '__dict__'))
+        self.assertEqual(point.a, ecc.S256Field(ecc.A))
+        self.assertEqual(point.b, ecc.S256Field(ecc.B))
+        self.assertEqual(point.y**2, point.x**3 + point.b)
+        with self.assertRaises(ValueError):
+            ecc.S256Point(1, 1)
+        with self.assertRaises(ValueError):
+            ecc.S256Point(ecc.P, ecc.G.y.num)
+        a, b = ecc.S256Field(ecc.P - 1), ecc.S256Field(2)
+        self.assertEqual(a + b, ecc.S256Field(1))
+        self.assertEqual(b - a, ecc.S256Field(3))
+        self.assertEqual(a * b, ecc.S256Field(ecc.P - 2))
+        self.assertEqual(b / b, ecc.S256Field(1))
+        self.assertEqual(3 * b, ecc.S256Field(6))
+
+    def test_parse_cache(self):
+        ecc.PARSE_CACHE.clear()
+        point = randint(1, ecc.N - 1) * ecc.G
+        compressed = point.sec()
+        first = ecc.S256Point.parse(compressed)
+        self.assertEqual(ecc.PARSE_CACHE.stats()['misses'], 1)
+        self.assertIs(ecc.S256Point.parse(compressed), first)
+        self.assertEqual(ecc.PARSE_CACHE.stats()['hits'], 1)
+        self.assertEqual(ecc.S256Point.parse(point.sec(compressed=False)), first)
+        self.assertEqual(len(ecc.PARSE_CACHE), 2)
+        # least recently used entries are evicted first
+        ecc.PARSE_CACHE.resize(1)
+        self.assertEqual(len(ecc.PARSE_CACHE), 1)
+        self.assertIsNone(ecc.PARSE_CACHE.get(compressed))
+        ecc.PARSE_CACHE.resize(0)
+        ecc.S256Point.parse(compressed)
+        self.assertEqual(len(ecc.PARSE_CACHE), 0)
+        ecc.PARSE_CACHE.resize(ecc.PARSE_CACHE_SIZE)
+
+    def test_parse_cache_threads(self):
+        # evictions by other threads between a lookup and its update
+        cache = ecc.PointCache(4)
+        def work(seed):
+            for i in range(200000):
+                key = bytes([i * (2 * seed + 1) % 9])
+                if cache.get(key) is None:
+                    cache.put(key, i)
+        self.assertEqual(run_threads(work), [])
+        self.assertLessEqual(len(cache), 4)
+
+    def test_cached_sec(self):
+        secret = randint(1, ecc.N - 1)
+        point = secret * ecc.G
+        self.assertIsNone(point.encoded)
+        self.assertIs(point.sec(), point.sec())
+        same = (secret - 1) * ecc.G + ecc.G
+        self.assertEqual(hash(same), hash(point))
+        self.assertEqual(len({point, same, ecc.S256Point.parse(point.sec())}), 1)
+        self.assertNotEqual(ecc.S256Point.parse(point.sec()), ecc.S256Point.parse((-point).sec()))
+
+    def test_table_cache(self):
+        cache = ecc.TableCache(threshold=3, budget=2 * ecc.FixedBaseTable.BYTES, tracked=4)
+        # as parsed from a transaction
+        points = [ecc.S256Point.decode((randint(1, ecc.N - 1) * ecc.G).sec()) for _ in range(3)]
+        self.assertIsNone(cache.lookup(points[0]))
+        self.assertIsNone(cache.lookup(points[0]))
+        table = cache.lookup(points[0])
+        self.assertIs(cache.lookup(points[0]), table)
+        scalar = randint(0, ecc.N - 1)
+        self.assertEqual(ecc.S256Point.from_jacobian(table.mul(scalar)), scalar * points[0])
+        # the least recently used table goes once the budget is exceeded
+        for point in points[1:]:
+            for _ in range(3):
+                cache.lookup(point)
+        self.assertEqual(cache.stats()['tables'], 2)
+        self.assertEqual(cache.stats()['builds'], 3)
+        self.assertIsNone(cache.lookup(points[0]))
+        cache.resize(0)
+        self.assertEqual(len(cache), 0)
+        self.assertIsNone(cache.lookup(points[1]))
+        # an arithmetic result is not converted to affine to be counted
+        cache = ecc.TableCache(threshold=1, budget=ecc.FixedBaseTable.BYTES, tracked=4)
+        total = points[0] + points[1]
+        self.assertIsNone(cache.lookup(total))
+        self.assertIsNone(total.affine)
+        total.normalize()
+        self.assertIsNotNone(cache.lookup(total))
+        # hot points give the same results through multi_mul
+        point = points[2]
+        terms = [(randint(0, ecc.N - 1), point), (randint(0, ecc.N - 1), ecc.G)]
+        expected = ecc.multi_mul(terms)
+        ecc.TABLE_CACHE.clear()
+        for _ in range(ecc.TABLE_CACHE_THRESHOLD + 1):
+            self.assertEqual(ecc.multi_mul(terms), expected)
+        self.assertEqual(ecc.TABLE_CACHE.stats()['builds'], 1)
+
+    def test_table_cache_threads(self):
+        cache = ecc.TableCache(threshold=2, budget=2 * ecc.FixedBaseTable.BYTES, tracked=4)
+        points = [randint(1, ecc.N - 1) * ecc.G for _ in range(9)]
+        for point in points:
+            point.sec()
+        def work(seed):
+            for i in range(100000):
+                cache.lookup(points[i * (2 * seed + 1) % 9])
+        # only the bookkeeping is under test, tables are left empty
+        with mock.patch.object(ecc.FixedBaseTable, 'build', lambda table: None):
+            self.assertEqual(run_threads(work), [])
+        self.assertLessEqual(len(cache), 2)
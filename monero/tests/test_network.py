@@ -5,22 +5,18 @@ import tx
 
 from io import BytesIO
 from unittest import TestCase
-from network import Network, currentdir,CHAIN_NAME
+from network import Network, CHAIN_NAME
+from chain import DATA_PATH
 from wallet import Wallet
 from address import UserKeys
 
 
 class NetworkTest(TestCase):
     def setUp(self):
-        nodes_path = os.path.join(currentdir, 'data', CHAIN_NAME, 'node.dat')
-        if os.path.isfile(nodes_path):
-            os.remove(nodes_path)
-        chain_path = os.path.join(currentdir, 'data', CHAIN_NAME, 'chain.dat')
-        if os.path.isfile(chain_path):
-            os.remove(chain_path)
-        tx_path = os.path.join(currentdir, 'data', CHAIN_NAME, 'tx.dat')
-        if os.path.isfile(tx_path):
-            os.remove(tx_path)
+        path = os.path.join(DATA_PATH, CHAIN_NAME)
+        for name in ('node.dat', 'chain.dat', 'chain.dat.idx', 'tx.dat'):
+            if os.path.isfile(os.path.join(path, name)):
+                os.remove(os.path.join(path, name))
 
         self.node = Network()
 
@@ -61,6 +57,23 @@ class NetworkTest(TestCase):
         self.node.loadNodes()
         self.assertTrue(len(self.node.nodes) == 2)
     
+    def test_damaged_log(self):
+        self.node.mine()
+        self.node.mine()
+        path = self.node.chain.getBlockDataFile()
+        with open(path, 'r+b') as f:
+            f.seek(self.node.chain.getBlockStore().offset(11) + 8)
+            byte = f.read(1)[0]
+            f.seek(-1, 1)
+            f.write(bytes([byte ^ 0xff]))
+        with open(path, 'rb') as f:
+            data = f.read()
+        # the node does not start over from a new genesis
+        with self.assertRaises(ValueError):
+            Network()
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), data)
+
     def test_wallet(self):
         address = self.node.address()
         self.assertTrue(self.node.balance() == 0)
@@ -1,11 +1,15 @@
 import os
 import sys
 import inspect
+import tempfile
+import threading
 
 currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
 parentdir = os.path.dirname(currentdir)
 sys.path.insert(0, parentdir)
 
+import ecc
+
 from unittest import TestCase
 from ring import *
 
@@ -65,4 +69,122 @@ class RingTest(TestCase):
         self.assertFalse(ring.verify(msg1, signature_2))
 
         self.assertTrue(set(signature_2[:vector_size]) <= set(images))
-        self.assertTrue(set(signature_4[:vector_size]) <= set(images))
\ No newline at end of file
+        self.assertTrue(set(signature_4[:vector_size]) <= set(images))
+
+    def test_H_p_cache(self):
+        point = EccKey(random.randint(1, EccOrder - 1)).point
+        H_P_CACHE.clear()
+        first = MLSAG.H_p(point)
+        self.assertIs(MLSAG.H_p(point), first)
+        self.assertEqual(H_P_CACHE.stats()['misses'], 1)
+        self.assertEqual(H_P_CACHE.stats()['hits'], 1)
+
+        cache = HashPointCache(1)
+        with tempfile.TemporaryDirectory() as tmp:
+            cache.open(os.path.join(tmp, 'hp'))
+            cache.put(point.sec(), first)
+            cache.put(first.sec(), point)
+            self.assertEqual(len(cache), 1)
+            # evicted from memory, read back from the store
+            self.assertEqual(cache.get(point.sec()), first)
+            self.assertEqual(cache.stats()['stored'], 2)
+            cache.close()
+            cache = HashPointCache(0)
+            cache.open(os.path.join(tmp, 'hp'))
+            self.assertEqual(cache.get(first.sec()), point)
+            self.assertIsNone(cache.get(EccGenerator.sec()))
+            cache.close()
+
+            # a forked worker stops writing, without committing the store
+            cache.open(os.path.join(tmp, 'hp'))
+            store = cache.store
+            cache.detach()
+            self.assertIsNone(cache.store)
+            cache.put(EccGenerator.sec(), point)
+            self.assertNotIn(EccGenerator.sec(), store)
+            store.close()
+
+    def test_H_p_cache_threads(self):
+        points = [EccKey(random.randint(1, EccOrder - 1)).point for _ in range(9)]
+        keys = [point.sec() for point in points]
+        cache = HashPointCache(4)
+        def run(rounds):
+            errors = []
+            def work(seed):
+                try:
+                    for i in range(rounds):
+                        j = i * (2 * seed + 1) % 9
+                        if cache.get(keys[j]) is None:
+                            cache.put(keys[j], points[j])
+                except Exception as e:
+                    errors.append(e)
+            interval = sys.getswitchinterval()
+            sys.setswitchinterval(1e-6)
+            threads = [threading.Thread(target=work, args=(i,)) for i in range(4)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            sys.setswitchinterval(interval)
+            return errors
+
+        # evictions by other threads between a lookup and its update
+        self.assertEqual(run(100000), [])
+        # and writes to the store from several threads
+        with tempfile.TemporaryDirectory() as tmp:
+            cache.open(os.path.join(tmp, 'hp'))
+            cache.clear()
+            self.assertEqual(run(2000), [])
+            self.assertEqual(cache.stats()['stored'], 9)
+            cache.close()
+            cache.open(os.path.join(tmp, 'hp'))
+            self.assertEqual([cache.get(key) for key in keys], points)
+            cache.close()
+
+    def test_MLSAG_hash_to_curve(self):
+        point = EccKey(random.randint(1, EccOrder - 1)).point
+        parsed = len(getattr(ecc, 'PARSE_CACHE', ()))
+        lifted = hash_to_curve(point.sec())
+        self.assertEqual(lifted, hash_to_curve(point.sec()))
+        # the candidates tried are not kept as parsed points
+        self.assertEqual(len(getattr(ecc, 'PARSE_CACHE', ())), parsed)
+        self.assertEqual(lifted.y.num % 2, 0)
+        self.assertEqual(MLSAG.H_p(point, MLSAG.H_P_TRY), lifted)
+        self.assertNotEqual(MLSAG.H_p(point, MLSAG.H_P_SCALAR), lifted)
+        with self.assertRaises(ValueError):
+            MLSAG.H_p(point, 7)
+
+        key = [[EccKey(random.randint(1, EccOrder - 1)) for j in range(2)] for i in range(3)]
+        keyPub = [[k.point for k in row] for row in key]
+        ring = MLSAG(keyPub, MLSAG.H_P_TRY)
+        signature = ring.sign("hello", 1, [k.secret for k in key[1]])
+        self.assertTrue(ring.verify("hello", signature))
+        self.assertFalse(ring.verify("world", signature))
+        # key images differ between versions
+        self.assertFalse(MLSAG(keyPub, MLSAG.H_P_SCALAR).verify("hello", signature))
+        self.assertEqual(signature[0], key[1][0].secret * MLSAG.H_p(keyPub[1][0], MLSAG.H_P_TRY))
+
+    def test_CLSAG(self):
+        size = 4
+        key = [[EccKey(random.randint(1, EccOrder - 1)) for j in range(2)] for i in range(size)]
+        keyPub = [[k.point for k in row] for row in key]
+        ring = CLSAG(keyPub, MLSAG.H_P_TRY)
+
+        for i in range(size):
+            signature = ring.sign("hello", i, [k.secret for k in key[i]])
+            self.assertEqual(len(signature), 3 + size)
+            self.assertTrue(ring.verify("hello", signature))
+            self.assertFalse(ring.verify("world", signature))
+            # same key image as an MLSAG over the same ring
+            self.assertEqual(signature[0], key[i][0].secret * MLSAG.H_p(keyPub[i][0], MLSAG.H_P_TRY))
+
+        signature = ring.sign("hello", 2, [k.secret for k in key[2]])
+        # a wrong commitment column, D or s does not close the ring
+        forged = ring.sign("hello", 2, [key[2][0].secret, key[1][1].secret])
+        self.assertFalse(ring.verify("hello", forged))
+        self.assertFalse(ring.verify("hello", signature[:1] + [EccGenerator] + signature[2:]))
+        self.assertFalse(ring.verify("hello", signature[:-1] + [(signature[-1] + 1) % EccOrder]))
+        self.assertFalse(CLSAG(keyPub[:3], MLSAG.H_P_TRY).verify("hello", signature))
+        # the linkable H_P_SCALAR is never picked by default
+        self.assertTrue(CLSAG(keyPub).verify("hello", signature))
+        self.assertEqual(MLSAG(keyPub).version, MLSAG.H_P_TRY)
@@ -0,0 +1,151 @@
+import setup
+import os
+import tempfile
+
+from unittest import TestCase
+from store import BlockStore, MappedBlocks
+
+
+class BlockStoreTest(TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, 'chain.dat')
+
+    def tearDown(self):
+        self.dir.cleanup()
+
+    def test_append(self):
+        store = BlockStore(self.path, sync=False)
+        self.assertFalse(store.exists())
+        with self.assertRaises(FileNotFoundError):
+            store.records()
+        blocks = [bytes([i]) * (100 + i) for i in range(5)]
+        for i, block in enumerate(blocks):
+            self.assertEqual(store.append(block), i)
+        self.assertEqual(len(store), 5)
+        self.assertEqual(store.read(3), blocks[3])
+        self.assertEqual(store.records(), blocks)
+        size = os.path.getsize(self.path)
+        store.append(b'new')
+        self.assertEqual(os.path.getsize(self.path), size + 8 + 3)
+        with self.assertRaises(IndexError):
+            store.read(6)
+
+        store.truncate(2)
+        self.assertEqual(len(store), 2)
+        self.assertEqual(store.records(), blocks[:2])
+        store.append(b'fork')
+        self.assertEqual(BlockStore(self.path).records(), blocks[:2] + [b'fork'])
+
+    def test_rewrite(self):
+        store = BlockStore(self.path)
+        blocks = [os.urandom(30) for i in range(4)]
+        store.rewrite(blocks)
+        self.assertEqual(store.records(), blocks)
+        self.assertEqual(len(store), 4)
+
+        # a rewrite that does not finish leaves the old log
+        def crash():
+            yield b'new'
+            raise KeyboardInterrupt
+        with self.assertRaises(KeyboardInterrupt):
+            store.rewrite(crash())
+        self.assertEqual(store.records(), blocks)
+        self.assertEqual(sorted(os.listdir(self.dir.name)), ['chain.dat', 'chain.dat.idx'])
+
+        # a crash between moving the log and its index
+        os.remove(store.indexPath)
+        self.assertEqual(store.offsets()[-1], store.offset(3))
+        self.assertEqual(store.read(3), blocks[3])
+
+        store.rewrite(blocks[:1])
+        self.assertEqual(store.records(), blocks[:1])
+        self.assertEqual(store.append(b'next'), 1)
+
+    def test_recovery(self):
+        store = BlockStore(self.path)
+        blocks = [os.urandom(50) for i in range(3)]
+        for block in blocks:
+            store.append(block)
+        # a crash in the middle of the next append
+        with open(self.path, 'ab') as f:
+            f.write(b'\x40\x00\x00\x00\x00\x00')
+        self.assertEqual(store.records(), blocks)
+        self.assertEqual(store.append(b'next'), 3)
+        self.assertEqual(store.records(), blocks + [b'next'])
+
+        # a last record longer than what was written is dropped too
+        with open(self.path, 'ab') as f:
+            f.write(b'\x40\x00\x00\x00\x00\x00\x00\x00' + os.urandom(20))
+        self.assertEqual(store.records(), blocks + [b'next'])
+        self.assertEqual(store.offsets()[-1], store.offset(3))
+
+        os.remove(store.indexPath)
+        self.assertEqual(store.records(), blocks + [b'next'])
+        self.assertEqual(store.read(1), blocks[1])
+
+        # a damaged record is not a torn write: nothing is cut
+        with open(self.path, 'r+b') as f:
+            f.seek(store.offset(2) + 8)
+            byte = f.read(1)[0]
+            f.seek(-1, 1)
+            f.write(bytes([byte ^ 0xff]))
+        size = os.path.getsize(self.path)
+        with self.assertRaises(ValueError):
+            store.records()
+        with self.assertRaises(ValueError):
+            store.read(2)
+        self.assertEqual(os.path.getsize(self.path), size)
+        self.assertEqual(len(store), 4)
+        self.assertEqual(store.read(3), b'next')
+
+        with open(self.path, 'wb') as f:
+            f.write(b'\x02' + os.urandom(20))
+        with self.assertRaises(ValueError):
+            store.records()
+
+    def test_mapped(self):
+        store = BlockStore(self.path, sync=False)
+        blocks = [os.urandom(40) for i in range(6)]
+        for block in blocks:
+            store.append(block)
+        parsed = []
+        mapped = MappedBlocks(store, lambda s: parsed.append(s) or bytearray(s), size=2)
+        self.assertEqual(parsed, [])
+        self.assertEqual(len(mapped), 6)
+        self.assertEqual(mapped[1], blocks[1])
+        self.assertIs(mapped[1], mapped[-5])
+        self.assertEqual(mapped[2:4], blocks[2:4])
+        # only 2 parsed blocks are kept: 1 was evicted
+        self.assertEqual(sorted(mapped.blocks), [2, 3])
+        self.assertEqual(len(parsed), 3)
+        mapped[1]
+        self.assertEqual(len(parsed), 4)
+        mapped.append(b'new')
+        # a scan parses what the cache misses, and keeps none of it
+        self.assertEqual(list(mapped.scan(1)), blocks[1:] + [b'new'])
+        self.assertEqual(list(mapped.scan(2, 4)), blocks[2:4])
+        self.assertEqual(sorted(mapped.blocks), [1, 3])
+        self.assertEqual(len(parsed), 8)
+        self.assertEqual(list(mapped), blocks + [b'new'])
+        with self.assertRaises(IndexError):
+            mapped[7]
+        mapped.close()
+
+        # a torn last record is dropped before mapping
+        with open(self.path, 'ab') as f:
+            f.write(b'\x10\x00')
+        mapped = MappedBlocks(store, bytes)
+        self.assertEqual(len(mapped), 6)
+        self.assertEqual(mapped[5], blocks[5])
+        mapped.close()
+
+        # a damaged record in the middle fails the map, not a later access
+        with open(self.path, 'r+b') as f:
+            f.seek(store.offset(2) + 8)
+            byte = f.read(1)[0]
+            f.seek(-1, 1)
+            f.write(bytes([byte ^ 0xff]))
+        with self.assertRaises(ValueError):
+            MappedBlocks(store, bytes)
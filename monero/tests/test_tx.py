@@ -261,6 +261,46 @@ class TxTest(TestCase):
         self.assertTrue(ten_input_one_output_tx.verify())
         self.assertTrue(ten_input_one_output_tx.fee == 1)
 
+        # rings hashing to points by try-and-increment
+        try_tx = Tx.generate(
+            user = user,
+            oneTimeAddresses=[
+                oneTimeAddresses[input]
+            ],
+            outs = [
+                (receiver, 90)
+            ],
+            type = 2,
+        )
+        self.assertTrue(try_tx.verify())
+        self.assertTrue(Tx.parse(BytesIO(try_tx.serialize())).verify())
+        self.assertFalse(try_tx.tx_ins[0].keyImage == one_input_one_output_tx.tx_ins[0].keyImage)
+        try_tx.type = 1
+        self.assertFalse(try_tx.verify())
+
+        # CLSAG rings
+        clsag_tx = Tx.generate(
+            user = user,
+            oneTimeAddresses=[
+                oneTimeAddresses[input]
+            ],
+            outs = [
+                (receiver, 90)
+            ],
+            type = 3,
+        )
+        self.assertTrue(clsag_tx.verify())
+        serialized = clsag_tx.serialize()
+        self.assertEqual(len(serialized), len(try_tx.serialize()) - 944 + TxIn.size(3))
+        parsed = Tx.parse(BytesIO(serialized))
+        self.assertTrue(parsed == clsag_tx)
+        self.assertTrue(parsed.verify())
+        # links with the type 2 spend of the same output
+        self.assertTrue(clsag_tx.tx_ins[0].keyImage == try_tx.tx_ins[0].keyImage)
+        # the signature's I must be the input's key image
+        clsag_tx.tx_ins[0].sig[0] = one_input_one_output_tx.tx_ins[0].keyImage
+        self.assertFalse(clsag_tx.verify())
+
 
     def test_MinerTx(self):
         user = UserKeys.generate()
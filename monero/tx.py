@@ -1,12 +1,14 @@
 import random
 from io import BytesIO
-from ring import MLSAG
+from ring import MLSAG, CLSAG
 from address import UserKeys
 from ecc import (
     PrivateKey as EccKey,
     S256Point as EccPoint,
     G as EccGenerator,
     N as EccOrder,
+    multi_mul,
+    normalize_batch,
 )
 
 from helper import (
@@ -16,11 +18,24 @@ from helper import (
 
 H_n = UserKeys.H_n
 
-H = 8 * EccKey(H_n([EccGenerator])).point
+# every commitment multiplies H, so it gets a fixed-base table like G
+H = (8 * EccKey(H_n([EccGenerator])).point).precompute()
 
 RING_SIZE = 6
 MINER_REWARD = 100
 
+# normal tx types and their (ring signature, H_p version); all keep verifying.
+# Types 1 and 2 sign with MLSAG, hashing to points with MLSAG.H_P_SCALAR and
+# MLSAG.H_P_TRY; type 3 signs with CLSAG, whose inputs are 225 bytes smaller
+RING_VERSIONS = {
+    1: (MLSAG, MLSAG.H_P_SCALAR),
+    2: (MLSAG, MLSAG.H_P_TRY),
+    3: (CLSAG, MLSAG.H_P_TRY),
+}
+# type of the transactions created here. Key images of an output differ
+# between ring versions, so a network switches types all at once
+TX_TYPE = 1
+
 """
 helper function
 """
@@ -36,17 +51,24 @@ def searchOneTimeAddrIndex(oneTimeAddr):
 def selectOneTimeAddr():
     raise RuntimeError("To be substitued")
 
+def currentRingVersion():
+    # H_p version of the key images made by TX_TYPE
+    return RING_VERSIONS[TX_TYPE][1]
+
+def ringType(version):
+    # tx type to create on a chain of the given H_p version:
+    # TX_TYPE, or else the latest type with that version
+    if RING_VERSIONS[TX_TYPE][1] == version:
+        return TX_TYPE
+    return max(t for t, (_, v) in RING_VERSIONS.items() if v == version)
+
 
 class Commit(EccPoint):
     def __init__(self, y, b):
-        p = y * EccGenerator + b * H
-        return super().__init__(p.x, p.y)
-    
-    def __eq__(self, other):
-        return EccPoint.parse(self.sec()) == EccPoint.parse(other.sec())
-    
-    def __sub__(self, other):
-        return EccPoint.parse(self.sec()) - EccPoint.parse(other.sec())
+        # both tables add into the same accumulator
+        p = multi_mul([(y, EccGenerator), (b, H)])
+        # p is on the curve by construction, skip the check in __init__
+        self.set_jacobian(p.jacobian)
 
     @classmethod
     def generate(cls, K_v, b, r, t=0):
@@ -83,10 +105,13 @@ class TxIn:
         self.ring = ring
         self.pseudoOut = pseudoOut
         self.keyImage = keyImage
-        # (I + c0 + s)
-        # I has size 2
-        # c0 is a hash256 int
-        # s has size 6 * 2
+        # MLSAG (tx types 1, 2): I + c0 + s
+        #   I has size 2
+        #   c0 is a hash256 int
+        #   s has size 6 * 2
+        # CLSAG (tx type 3): [I, D, c0] + s
+        #   I is the key image, D a point
+        #   s has size 6
         self.sig = sig
     
     def __eq__(self, other):
@@ -105,7 +130,7 @@ class TxIn:
         return result
     
     @classmethod
-    def generateUnsigned(cls, oneTimeAddr, user, t=0, pseudoMask=None):
+    def generateUnsigned(cls, oneTimeAddr, user, t=0, pseudoMask=None, type=1):
         prevOut = searchOneTimeAddr(oneTimeAddr)
         if not user.ownsOneTimeAddr((prevOut.txPubKey, prevOut.oneTimeAddr, t)):
             raise RuntimeError("user does NOT own prevOut")
@@ -125,7 +150,7 @@ class TxIn:
                 k_v = user.view.secret,
                 t = t,
             )
-        pseudoOut = pseudoMask * EccGenerator + b * H
+        pseudoOut = multi_mul([(pseudoMask, EccGenerator), (b, H)])
 
         # construct ring
         ring = [None] * RING_SIZE
@@ -142,8 +167,9 @@ class TxIn:
         sig = None 
 
         # add key Image
+        version = RING_VERSIONS[type][1]
         keyImage = user.generateOneTimeSecret((prevOut.txPubKey, oneTimeAddr, t)) * \
-            MLSAG.H_p(oneTimeAddr)
+            MLSAG.H_p(oneTimeAddr, version)
 
         return cls(ring, pseudoOut, keyImage, sig)
     
@@ -158,9 +184,22 @@ class TxIn:
 
         return cls(ring=ring, pseudoOut=pseudoOut, keyImage=keyImage, sig=None)
     
+    @staticmethod
+    def size(type=1):
+        # serialized length of a signed input, see serialize
+        if type in RING_VERSIONS and RING_VERSIONS[type][0] is CLSAG:
+            return 719
+        return 944
+
     @classmethod
-    def parse(cls, stream):
+    def parse(cls, stream, type=1):
         unsigned = cls.parse_unsigned(BytesIO(stream.read(462)))
+        if RING_VERSIONS[type][0] is CLSAG:
+            D = EccPoint.parse(stream.read(33))
+            c0 = little_endian_to_int(stream.read(32))
+            s = [little_endian_to_int(stream.read(32)) for i in range(RING_SIZE)]
+            unsigned.sig = [unsigned.keyImage, D, c0] + s
+            return unsigned
         I = [None] * 2
         for i in range(2):
             I[i] = EccPoint.parse(stream.read(33))
@@ -184,6 +223,7 @@ class TxIn:
         # keyImage is a EccPoint
         #   size: 33 bytes
         # In total: 33 bytes * 14 = 462 bytes
+        normalize_batch([p for row in self.ring for p in row] + [self.pseudoOut, self.keyImage])
         result = b''
         for i in range(RING_SIZE):
             for j in range(2):
@@ -193,16 +233,28 @@ class TxIn:
 
         return result
     
-    def serialize(self):
+    def serialize(self, type=1):
         # serialized unsigned: 462 bytes
-        # sig:
+        # MLSAG sig:
         #   (I + c0 + s)
         #   I has size 2 * 33 bytes
         #   c0 is a hash256 int: 256 / 8 = 32 bytes
         #   s has size 6 * 2, each has 32 bytes
         #   sig total = 2 * 33 + 32 + 12 * 32 = 482 bytes
         # Total: 462 bytes + 482 bytes = 944 bytes
+        # CLSAG sig:
+        #   ([I, D, c0] + s), I is the key image and not repeated
+        #   D: 33 bytes, c0: 32 bytes, s has size 6, each has 32 bytes
+        #   sig total = 33 + 32 + 6 * 32 = 257 bytes
+        # Total: 462 bytes + 257 bytes = 719 bytes
         result = self.serialize_unsigned()
+        if RING_VERSIONS[type][0] is CLSAG:
+            D, c0 = self.sig[1:3]
+            result += D.sec()
+            result += int_to_little_endian(c0, 32)
+            for s in self.sig[3:]:
+                result += int_to_little_endian(s, 32)
+            return result
         I = self.sig[0:2]
         c0 = self.sig[2]
         s = self.sig[3:]
@@ -216,10 +268,17 @@ class TxIn:
         return result
 
 
-    def sign(self, oneTimeAddr, user, m, pseudoMask, t=0):
+    def sign(self, oneTimeAddr, user, m, pseudoMask, t=0, type=1):
         if self.sig is not None:
             raise RuntimeError("cannot re-sign TxIn")
-        prevOut = searchOneTimeAddr(oneTimeAddr)
+        _pi, secrets = self.signingKeys(oneTimeAddr, user, pseudoMask, t)
+        self.signRing(m, _pi, secrets, type)
+
+    def signingKeys(self, oneTimeAddr, user, pseudoMask, t=0, prevOut=None):
+        # returns (ring index, secrets) to sign the ring with: the one-time
+        # secret of oneTimeAddr and the mask of its commitment to zero
+        if prevOut is None:
+            prevOut = searchOneTimeAddr(oneTimeAddr)
         if not user.ownsOneTimeAddr((prevOut.txPubKey, prevOut.oneTimeAddr, t)):
             raise RuntimeError("user does NOT own prevOut")
         if prevOut.commit == Commit(1, prevOut.amount):
@@ -232,12 +291,20 @@ class TxIn:
 
         _pi = [_[0] for _ in self.ring].index(oneTimeAddr)
 
-        self.sig = MLSAG(self.ring).sign(m, _pi, secrets)
+        return _pi, secrets
+
+    def signRing(self, m, index, secrets, type=1):
+        # needs no chain lookups, so it can run in a worker process
+        scheme, version = RING_VERSIONS[type]
+        self.sig = scheme(self.ring, version).sign(m, index, secrets)
     
-    def verify(self, m):
+    def verify(self, m, type=1):
         if self.sig is None:
             raise RuntimeError("cannot verify unsigned TxIn")
-        return MLSAG(self.ring).verify(m, self.sig)
+        scheme, version = RING_VERSIONS[type]
+        if scheme is CLSAG and self.sig[0] != self.keyImage:
+            return False
+        return scheme(self.ring, version).verify(m, self.sig)
 
         
 
@@ -322,7 +389,7 @@ class Tx:
     """
     Transaction class:
     4 fields
-    1. type: 0 (miner transaction), 1 (normal transaction)
+    1. type: 0 (miner transaction), 1, 2 or 3 (normal transaction, see RING_VERSIONS)
     2. tx_ins: a list of TxIn object
     3. tx_outs: a list of TxOut object
     4. fee: clear text
@@ -356,14 +423,17 @@ class Tx:
 
 
     @classmethod
-    def generate(cls, user, oneTimeAddresses, outs):
+    def generate(cls, user, oneTimeAddresses, outs, type=None, verifier=None):
         # inputs:
         #   user: UserKeys object
         #   oneTimeAddresses: a list of oneTimeAddress
         #   outs: a list of (pubKey, amount) tuple
+        #   type: a key of RING_VERSIONS, TX_TYPE by default
+        #   verifier: a verifier.Verifier signing the inputs in parallel
         r = random.randint(1, EccOrder)
         
-        type = 1
+        if type is None:
+            type = TX_TYPE
 
         # generate tx outputs
         tx_outs = []
@@ -388,9 +458,12 @@ class Tx:
         tx_ins = []
         tx_in_amounts = []
         pseudoMasks = []
+        prevOuts = []
+        ts = []
         for i in range(len(oneTimeAddresses)):
             oneTimeAddr = oneTimeAddresses[i]
             t = searchOneTimeAddrIndex(oneTimeAddr)
+            ts.append(t)
             if i == len(oneTimeAddresses) - 1:
                 if not len(pseudoMasks) == len(oneTimeAddresses) - 1:
                     raise ValueError("Incorrect No. of pseudoMasks")
@@ -403,17 +476,18 @@ class Tx:
                     user = user,
                     t = t,
                     pseudoMask=pseudoMask,
+                    type = type,
             )
             prevOut = searchOneTimeAddr(oneTimeAddr)
+            prevOuts.append(prevOut)
             if prevOut.commit == Commit(1, prevOut.amount):
                 b = prevOut.amount
-                t = 0
             else:
                 b = Commit.resolve(
                     txPubKey = prevOut.txPubKey,
                     amount = prevOut.amount,
                     k_v = user.view.secret,
-                    t = searchOneTimeAddrIndex(oneTimeAddr),
+                    t = t,
                 )
             tx_in_amounts.append(b)
             tx_ins.append(tx_in)
@@ -430,17 +504,27 @@ class Tx:
         )
         m = tx.serialize_unsigned()
 
-        # sign each tx in
+        # sign each tx in; the pseudoMasks are all fixed by now, so the
+        # rings can be signed and checked in any order
+        jobs = []
         for i in range(len(tx.tx_ins)):
-            tx.tx_ins[i].sign(
+            _pi, secrets = tx.tx_ins[i].signingKeys(
                 oneTimeAddr=oneTimeAddresses[i],
                 user = user,
-                m = m,
                 pseudoMask=pseudoMasks[i],
-                t = searchOneTimeAddrIndex(oneTimeAddresses[i]),
+                t = ts[i],
+                prevOut = prevOuts[i],
             )
-            if not tx.tx_ins[i].verify(m):
-                raise RuntimeError("sig verification failed")
+            jobs.append((m, type, tx.tx_ins[i], _pi, secrets))
+        if verifier is None:
+            verdicts = []
+            for m, type, tx_in, _pi, secrets in jobs:
+                tx_in.signRing(m, _pi, secrets, type)
+                verdicts.append(tx_in.verify(m, type))
+        else:
+            verdicts = verifier.sign(jobs)
+        if not all(verdicts):
+            raise RuntimeError("sig verification failed")
 
         return tx
     
@@ -476,24 +560,45 @@ class Tx:
             images.append(tx_in.keyImage)
         return images
 
-    def verify(self):
-        if self.type == 1:
-            m = self.serialize_unsigned()
-            for tx_in in self.tx_ins:
-                # verify sig
-                if not tx_in.verify(m):
+    def ringVersion(self):
+        # H_p version of the key images, None for a miner tx
+        if self.type not in RING_VERSIONS:
+            return None
+        return RING_VERSIONS[self.type][1]
+
+    def ringJobs(self):
+        # (m, tx type, TxIn) for every input, as taken by
+        # TxIn.verify and verifier.Verifier
+        if self.type not in RING_VERSIONS:
+            return []
+        m = self.serialize_unsigned()
+        return [(m, self.type, tx_in) for tx_in in self.tx_ins]
+
+    def verify(self, verifier=None, rings=True):
+        # verifier: a verifier.Verifier checking the inputs in parallel
+        # rings: False skips the ring signatures, for callers that
+        #   checked the ringJobs of many transactions in one batch
+        if self.type in RING_VERSIONS:
+            if rings:
+                jobs = self.ringJobs()
+                if verifier is None:
+                    # verify sig
+                    verdicts = (tx_in.verify(m, type) for m, type, tx_in in jobs)
+                else:
+                    verdicts = verifier.verify(jobs)
+                if not all(verdicts):
                     return False
             # verify amount
-            commit_sum = 0 * EccGenerator
-            for i in self.tx_ins:
-                commit_sum += i.pseudoOut
+            # sum(pseudoOut) - sum(commit) - fee*H must be the point
+            # at infinity, as a single multi_mul
+            terms = [(1, i.pseudoOut) for i in self.tx_ins]
             # duplicate keyImages
             images = self.getKeyImages()
             if len(set(images)) != len(self.tx_ins):
                 return False
-            for o in self.tx_outs:
-                commit_sum -= o.commit
-            if not commit_sum == self.fee * H:
+            terms += [(-1, o.commit) for o in self.tx_outs]
+            terms.append((-self.fee, H))
+            if multi_mul(terms).x is not None:
                 return False
             return True
         elif self.type == 0:
@@ -516,7 +621,7 @@ class Tx:
     
     def serialize(self):
         result = b''
-        # 1 byte for type (0 or 1)
+        # 1 byte for type (0, or a key of RING_VERSIONS)
         result += int_to_little_endian(self.type, 1)
         # 8 bytes for tx fee
         result += int_to_little_endian(self.fee, 8)
@@ -526,8 +631,8 @@ class Tx:
             raise ValueError("Invalid input len")
         result += int_to_little_endian(in_len, 1)
         for i in range(in_len):
-            # each input has len 944 bytes
-            result += self.tx_ins[i].serialize()
+            # each input has len TxIn.size(type) bytes
+            result += self.tx_ins[i].serialize(self.type)
         out_len = len(self.tx_outs)
         if out_len < 0 or out_len > 0xff:
             raise ValueError("Invalid output len")
@@ -536,7 +641,7 @@ class Tx:
             # each output has len 107 bytes
             result += self.tx_outs[i].serialize()
 
-        total_len = 1 + 8 + 1 + in_len * 944 + 1 + out_len * 107
+        total_len = 1 + 8 + 1 + in_len * TxIn.size(self.type) + 1 + out_len * 107
         if len(result) != total_len:
             raise ValueError("error when serializing tx")
         
@@ -544,10 +649,10 @@ class Tx:
 
     @classmethod
     def parse(cls, s):
-        # 1 byte for type (0 or 1)
+        # 1 byte for type (0, or a key of RING_VERSIONS)
         type = little_endian_to_int(s.read(1))
-        if type != 0 and type != 1:
-            raise ValueError("Tx type can only be 0 or 1")
+        if type != 0 and type not in RING_VERSIONS:
+            raise ValueError("Tx type can only be 0 or a key of RING_VERSIONS")
         # 8 bytes for tx fee
         fee = little_endian_to_int(s.read(8))
 
@@ -556,7 +661,7 @@ class Tx:
         if type == 0 and in_len != 0:
             raise ValueError("Miner Tx cannot have non-zero inputs")
         for i in range(in_len):
-            tx_ins.append(TxIn.parse(BytesIO(s.read(944))))
+            tx_ins.append(TxIn.parse(BytesIO(s.read(TxIn.size(type))), type))
         
         out_len = little_endian_to_int(s.read(1))
         tx_outs = []
@@ -0,0 +1,85 @@
+import os
+
+from concurrent.futures import ProcessPoolExecutor
+from io import BytesIO
+from ring import H_P_CACHE
+from tx import TxIn
+
+
+def initWorker():
+    # forked workers inherit the open H_p store, but dbm has no locking
+    # across processes: only the parent writes it
+    H_P_CACHE.detach()
+
+
+def verifyInput(job):
+    # runs in a worker: job is (m, tx type, serialized TxIn)
+    m, type, data = job
+    return TxIn.parse(BytesIO(data), type).verify(m, type)
+
+
+def signInput(job):
+    # runs in a worker: job is (m, tx type, unsigned TxIn, ring index, secrets)
+    # returns the signed TxIn serialized, or None if it does not verify
+    m, type, data, index, secrets = job
+    tx_in = TxIn.parse_unsigned(BytesIO(data))
+    tx_in.signRing(m, index, secrets, type)
+    if not tx_in.verify(m, type):
+        return None
+    return tx_in.serialize(type)
+
+
+class Verifier:
+    """
+    Checks and signs TxIn ring signatures in a pool of worker processes
+
+    Inputs are independent, so each one is shipped to a worker as its
+    serialization (TxIn.size bytes) and the verdicts come back in order. The
+    pool starts on the first batch with more than one input and is reused.
+    """
+
+    def __init__(self, workers=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.executor = None
+
+    def pool(self, jobs):
+        # the executor for a batch, None if it is not worth one
+        if self.workers <= 1 or len(jobs) <= 1:
+            return None
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(self.workers, initializer=initWorker)
+        return self.executor
+
+    def verify(self, jobs):
+        # jobs: (m, tx type, TxIn) tuples, see Tx.ringJobs
+        # returns a list with one boolean per job
+        executor = self.pool(jobs)
+        if executor is None:
+            return [tx_in.verify(m, type) for m, type, tx_in in jobs]
+        data = [(m, type, tx_in.serialize(type)) for m, type, tx_in in jobs]
+        return list(executor.map(verifyInput, data))
+
+    def sign(self, jobs):
+        # jobs: (m, tx type, unsigned TxIn, ring index, secrets) tuples,
+        # see Tx.generate. Signs each TxIn in place and checks the result;
+        # returns a list with one boolean per job
+        executor = self.pool(jobs)
+        if executor is None:
+            verdicts = []
+            for m, type, tx_in, index, secrets in jobs:
+                tx_in.signRing(m, index, secrets, type)
+                verdicts.append(tx_in.verify(m, type))
+            return verdicts
+        data = [(m, type, tx_in.serialize_unsigned(), index, secrets)
+                for m, type, tx_in, index, secrets in jobs]
+        verdicts = []
+        for (m, type, tx_in, _, _), signed in zip(jobs, executor.map(signInput, data)):
+            if signed is not None:
+                tx_in.sig = TxIn.parse(BytesIO(signed), type).sig
+            verdicts.append(signed is not None)
+        return verdicts
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
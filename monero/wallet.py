@@ -1,7 +1,7 @@
 import os
 import inspect
 
-from tx import Tx, Commit
+from tx import Tx, Commit, ringType
 from ecc import S256Point as EccPoint
 from ring import MLSAG
 from address import UserKeys
@@ -9,7 +9,8 @@ from address import UserKeys
 
 currentdir = os.path.dirname(os.path.abspath(inspect.getfile(inspect.currentframe())))
 
-SECRET_PATH = os.path.join(currentdir, 'secret')
+# set by the RING_SECRET environment variable
+SECRET_PATH = os.environ.get('RING_SECRET') or os.path.join(currentdir, 'secret')
 VIEW_SECRET_PATH = os.path.join(SECRET_PATH, 'view')
 SPEND_SECRET_PATH = os.path.join(SECRET_PATH, 'spend')
 
@@ -42,6 +43,7 @@ class Wallet:
     def scan_chain(self, chain):
         # get oneTimeAddr, amount belonged to the wallet
         result = []
+        version = chain.ringVersion
 
         for block in chain.blocks:
             minerOut = block.miner.tx_outs[0]
@@ -49,7 +51,7 @@ class Wallet:
                 oneTimeAddr = minerOut.oneTimeAddr
                 amount = minerOut.amount
                 keyImage = self.key.generateOneTimeSecret((minerOut.txPubKey, oneTimeAddr, 0)) * \
-                    MLSAG.H_p(oneTimeAddr)
+                    MLSAG.H_p(oneTimeAddr, version)
                 result.append((oneTimeAddr, amount, keyImage))
             for tx in block.txs:
                 for t in range(len(tx.tx_outs)):
@@ -57,14 +59,15 @@ class Wallet:
                     if self.key.ownsOneTimeAddr((out.txPubKey, out.oneTimeAddr, t)):
                         amount = Commit.resolve(out.txPubKey, out.amount, self.key.view.secret, t)
                         keyImage = self.key.generateOneTimeSecret((out.txPubKey, out.oneTimeAddr, t)) * \
-                            MLSAG.H_p(out.oneTimeAddr)
+                            MLSAG.H_p(out.oneTimeAddr, version)
                         result.append((out.oneTimeAddr, amount, keyImage))
         
-        images = chain.getKeyImages()
+        # spent in a block, or by a tx waiting to be mined
+        pending = set()
         for tx in chain.txs:
-            images += tx.getKeyImages()
+            pending.update(i.sec() for i in tx.getKeyImages())
         
-        return [x for x in result if x[2] not in images]
+        return [x for x in result if not chain.isSpent(x[2]) and x[2].sec() not in pending]
             
     def address(self):
         (K_v, K_s, sub) = self.key.getPubKey()
@@ -92,7 +95,7 @@ class Wallet:
     def mine(self, chain):
         chain.mine(pubKeyPair=self.key.getPubKey())
     
-    def send(self, addr, chain, amount, fee):
+    def send(self, addr, chain, amount, fee, verifier=None):
         unspent = self.scan_chain(chain)
         balance = self.amount(chain, unspent=unspent)
         if amount < 0 or amount > 0xffffffffffffffff:
@@ -114,7 +117,9 @@ class Wallet:
             outs = [
                 (pubKey, amount),
                 (self.key.getPubKey(), change)
-            ]
+            ],
+            type = ringType(chain.ringVersion),
+            verifier = verifier,
         )
         if t.verify():
             chain.add_tx(t)
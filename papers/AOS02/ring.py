@@ -6,6 +6,7 @@ from ecc import (
     PrivateKey as EccKey,
     G as EccGenerator,
     N as EccOrder,
+    multi_mul,
 )
 
 class AOSRing:
@@ -53,7 +54,7 @@ class AOSRing:
     def V(s, c, k):
         if not isinstance(k, EccKey):
             raise TypeError('Only ECC key is allowed')
-        return s * EccGenerator - c * k.point
+        return multi_mul([(s, EccGenerator), (-c, k.point)])
     
     def H(self, m, e):
         h = hashlib.sha1(self.L)
@@ -6,13 +6,21 @@ from ecc import (
     S256Point as EccPubKey,
     G as EccGenerator,
     N as EccOrder,
+    multi_mul,
+    hash_to_curve,
 )
 
 class Bac_LSAG:
 
-    def __init__(self, k):
+    # H_P_SCALAR maps to hash(point) * G, whose discrete log is known;
+    # H_P_TRY lifts the hash to a curve point with hash_to_curve
+    H_P_SCALAR = 0
+    H_P_TRY = 1
+
+    def __init__(self, k, version=H_P_SCALAR):
         self.k = k
         self.n = len(k)
+        self.version = version
         self.vk_serialize()
     
     def vk_serialize(self):
@@ -23,7 +31,9 @@ class Bac_LSAG:
             self.L += key.point.sec()
     
     @staticmethod
-    def H_p(point):
+    def H_p(point, version=H_P_SCALAR):
+        if version == Bac_LSAG.H_P_TRY:
+            return hash_to_curve(point.sec())
         hashed_p = hashlib.sha1(point.sec())
         return (int(hashed_p.hexdigest(), 16) % EccOrder) * EccGenerator
 
@@ -44,7 +54,7 @@ class Bac_LSAG:
         return int(h.hexdigest(), 16)
 
     def sign(self, m, z):
-        I = self.k[z].secret * self.H_p(self.k[z].point)
+        I = self.k[z].secret * self.H_p(self.k[z].point, self.version)
         L = [None] * self.n
         R = [None] * self.n
         c = [None] * self.n
@@ -52,7 +62,7 @@ class Bac_LSAG:
         _alpha = random.randint(0, EccOrder)
 
         L[z] = _alpha * EccGenerator
-        R[z] = _alpha * self.H_p(self.k[z].point)
+        R[z] = _alpha * self.H_p(self.k[z].point, self.version)
         c[(z+1) % self.n] = self.H([m, L[z], R[z]])
 
         first_range = list(range(z + 1, self.n))
@@ -60,8 +70,8 @@ class Bac_LSAG:
         whole_range = first_range + second_range
 
         for i in whole_range:
-            L[i] = s[i] * EccGenerator + c[i] * self.k[i].point
-            R[i] = s[i] * self.H_p(self.k[i].point) + c[i] * I
+            L[i] = multi_mul([(s[i], EccGenerator), (c[i], self.k[i].point)])
+            R[i] = multi_mul([(s[i], self.H_p(self.k[i].point, self.version)), (c[i], I)])
             c[(i+1) % self.n] = self.H([m, L[i], R[i]])
         
         s[z] = (_alpha - c[z] * self.k[z].secret) % EccOrder
@@ -79,8 +89,8 @@ class Bac_LSAG:
         c[0] = c0
 
         for i in range(self.n):
-            L[i] = s[i] * EccGenerator + c[i] * self.k[i].point
-            R[i] = s[i] * self.H_p(self.k[i].point) + c[i] *I
+            L[i] = multi_mul([(s[i], EccGenerator), (c[i], self.k[i].point)])
+            R[i] = multi_mul([(s[i], self.H_p(self.k[i].point, self.version)), (c[i], I)])
             c[i+1] = self.H([m, L[i], R[i]])
 
         return c[0] == c[self.n]
\ No newline at end of file
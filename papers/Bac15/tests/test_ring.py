@@ -57,4 +57,18 @@ class RingTest(TestCase):
             self.assertTrue(signature_1[0] == signature_2[0])
             self.assertTrue(signature_3[0] == signature_4[0])
             self.assertFalse(signature_1[0] == signature_3[0])
-            self.assertFalse(signature_2[0] == signature_3[0])
\ No newline at end of file
+            self.assertFalse(signature_2[0] == signature_3[0])
+
+    def test_LSAG_hash_to_curve(self):
+        size = 4
+        msg1, msg2 = "hello", "world"
+        key = [EccKey(random.randint(1, EccOrder - 1)) for _ in range(size)]
+        ring = Bac_LSAG(key, version=Bac_LSAG.H_P_TRY)
+        point = key[0].point
+        self.assertEqual(Bac_LSAG.H_p(point, Bac_LSAG.H_P_TRY), hash_to_curve(point.sec()))
+        self.assertNotEqual(Bac_LSAG.H_p(point, Bac_LSAG.H_P_TRY), Bac_LSAG.H_p(point))
+
+        signature_1 = ring.sign(msg1, 0)
+        self.assertTrue(ring.verify(msg1, signature_1))
+        self.assertFalse(ring.verify(msg2, signature_1))
+        self.assertFalse(Bac_LSAG(key).verify(msg1, signature_1))
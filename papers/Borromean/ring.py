@@ -6,6 +6,7 @@ from ecc import (
     S256Point as EccPubKey,
     G as EccGenerator,
     N as EccOrder,
+    multi_mul,
 )
 
 class BorromeanRing:
@@ -63,13 +64,13 @@ class BorromeanRing:
                 s[i][j] = random.randint(0, EccOrder)
                 e[i][j+1] = self.H([
                     M,
-                    s[i][j] * EccGenerator - e[i][j] * self.rings[i][j].point,
+                    multi_mul([(s[i][j], EccGenerator), (-e[i][j], self.rings[i][j].point)]),
                     i,
                     j,
                 ])
             s[i][m_i - 1] = random.randint(0, EccOrder)
 
-            hashin.append(s[i][m_i - 1] * EccGenerator - e[i][m_i - 1] * self.rings[i][m_i - 1].point)
+            hashin.append(multi_mul([(s[i][m_i - 1], EccGenerator), (-e[i][m_i - 1], self.rings[i][m_i - 1].point)]))
         e0 = self.H(hashin)
         
         for i in range(self.n):
@@ -79,7 +80,7 @@ class BorromeanRing:
                 s[i][j] = random.randint(0, EccOrder)
                 e[i][j+1] = self.H([
                     M,
-                    s[i][j] * EccGenerator - e[i][j] * self.rings[i][j].point,
+                    multi_mul([(s[i][j], EccGenerator), (-e[i][j], self.rings[i][j].point)]),
                     i,
                     j,
                 ])
@@ -98,7 +99,7 @@ class BorromeanRing:
 
         for i in range(self.n):
             for j in range(len(self.rings[i])):
-                R[i][j + 1] = s[i][j] * EccGenerator - e[i][j] * self.rings[i][j].point
+                R[i][j + 1] = multi_mul([(s[i][j], EccGenerator), (-e[i][j], self.rings[i][j].point)])
                 e[i][j + 1] = self.H([M, R[i][j + 1], i, j])
 
         hashin = []
@@ -1 +1 @@
-../../bitcoin/lib/helper.py
\ No newline at end of file
+../../monero/helper.py
\ No newline at end of file
@@ -6,6 +6,7 @@ from ecc import (
     S256Point as EccPubKey,
     G as EccGenerator,
     N as EccOrder,
+    multi_mul,
 )
 
 class LSAG:
@@ -67,8 +68,8 @@ class LSAG:
                 self.L,
                 y,
                 m,
-                s[i] * EccGenerator + c[i] * self.k[i].point,
-                s[i] * self.h + c[i] * y,
+                multi_mul([(s[i], EccGenerator), (c[i], self.k[i].point)]),
+                multi_mul([(s[i], self.h), (c[i], y)]),
             ])
         s[z] = (u - self.k[z].secret*c[z]) % EccOrder
 
@@ -86,7 +87,7 @@ class LSAG:
                 self.L,
                 y,
                 m,
-                s[i] * EccGenerator + c[i] * self.k[i].point,
-                s[i] * self.h + c[i] * y,
+                multi_mul([(s[i], EccGenerator), (c[i], self.k[i].point)]),
+                multi_mul([(s[i], self.h), (c[i], y)]),
             ])
         return c0 == c[self.n]
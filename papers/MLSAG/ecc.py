@@ -1 +1 @@
-../../bitcoin/lib/ecc.py
\ No newline at end of file
+../../monero/ecc.py
\ No newline at end of file
@@ -6,6 +6,8 @@ from ecc import (
     S256Point as EccPubKey,
     G as EccGenerator,
     N as EccOrder,
+    multi_mul,
+    normalize_batch,
 )
 
 class MLSAG:
@@ -22,6 +24,8 @@ class MLSAG:
 
     @staticmethod
     def H(l):
+        # one inversion for every L/R point instead of one each
+        normalize_batch([item for item in l if isinstance(item, EccPubKey)])
         h = hashlib.sha1()
         for item in l:
             if isinstance(item, str):
@@ -68,8 +72,8 @@ class MLSAG:
         for i in whole_range:
             hashin = [m]
             for j in range(self.m):
-                L[i][j] = s[i][j] * EccGenerator + c[i] * self.k[i][j].point
-                R[i][j] = s[i][j] * self.H_p(self.k[i][j].point) + c[i] * I[j]
+                L[i][j] = multi_mul([(s[i][j], EccGenerator), (c[i], self.k[i][j].point)])
+                R[i][j] = multi_mul([(s[i][j], self.H_p(self.k[i][j].point)), (c[i], I[j])])
                 hashin.append(L[i][j])
                 hashin.append(R[i][j])
             c[(i+1) % self.n] = self.H(hashin)
@@ -92,8 +96,8 @@ class MLSAG:
         for i in range(self.n):
             hashin = [m]
             for j in range(self.m):
-                L[i][j] = s[i][j] * EccGenerator + c[i] * self.k[i][j].point
-                R[i][j] = s[i][j] * self.H_p(self.k[i][j].point) + c[i] * I[j]
+                L[i][j] = multi_mul([(s[i][j], EccGenerator), (c[i], self.k[i][j].point)])
+                R[i][j] = multi_mul([(s[i][j], self.H_p(self.k[i][j].point)), (c[i], I[j])])
                 hashin.append(L[i][j])
                 hashin.append(R[i][j])
             c[i+1] = self.H(hashin)